@@ -17,6 +17,7 @@ from app.core.supabase import supabase, get_request_scoped_client
 from app.core.security import get_current_user, require_role
 from app.core.salary_calculator import SalaryCalculator
 from app.core.logging_config import get_logger
+from app.core.cache import invalidate_financial_reports
 from app.core.exceptions import (
     DatabaseError,
     NotFoundError,
@@ -583,6 +584,7 @@ async def recalculate_salary(
         
         if not response.data:
             raise DatabaseError("Failed to update calculation", error_code="UPDATE_FAILED")
+        invalidate_financial_reports()
         
         logger.info(f"Recalculated salary {calculation_id}")
         return MonthlySalaryCalculationResponse(**response.data[0])
@@ -671,6 +673,7 @@ async def approve_salary_calculation(
         
         if not response.data:
             raise DatabaseError("Failed to approve calculation", error_code="APPROVAL_FAILED")
+        invalidate_financial_reports()
         
         logger.info(f"Salary calculation {calculation_id} approved by {current_user.get('sub')}")
         return MonthlySalaryCalculationResponse(**response.data[0])
@@ -724,6 +727,9 @@ async def bulk_approve_salary_calculations(
                 errors.append(f"Error approving {calc_id}: {str(e)}")
                 continue
         
+        if approved_count:
+            invalidate_financial_reports()
+        
         return {
             "approved_count": approved_count,
             "total_count": len(calculation_ids),
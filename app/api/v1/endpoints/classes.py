@@ -7,6 +7,7 @@ from app.models.class_model import (
 from app.core.supabase import supabase, get_request_scoped_client
 from app.core.supabase_helpers import get_db_client
 from app.core.security import get_current_user, require_role
+from app.core.cache import invalidate_teacher_classes
 
 router = APIRouter()
 
@@ -21,6 +22,7 @@ async def create_class(
         db = get_db_client(current_user, is_admin_operation=True)
         class_record = class_data.model_dump()
         response = db.table("classes").insert(class_record).execute()
+        invalidate_teacher_classes()
         
         return ClassResponse(**response.data[0])
         
@@ -126,6 +128,7 @@ async def update_class(
             )
         
         response = db.table("classes").update(update_data).eq("id", class_id).execute()
+        invalidate_teacher_classes()
         
         if not response.data:
             raise HTTPException(
@@ -166,6 +169,7 @@ async def assign_teacher(
         response = db.table("classes").update({
             "teacher_id": request.teacher_id
         }).eq("id", class_id).execute()
+        invalidate_teacher_classes()
         
         if not response.data:
             raise HTTPException(
@@ -258,6 +262,7 @@ async def delete_class(
             )
         
         db.table("classes").delete().eq("id", class_id).execute()
+        invalidate_teacher_classes()
         
         return {"message": "Class deleted successfully"}
         
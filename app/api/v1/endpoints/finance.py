@@ -14,6 +14,7 @@ from app.core.supabase import supabase, get_request_scoped_client
 from app.core.security import get_current_user, require_role
 from app.core.logging_config import get_logger
 from app.core.exceptions import DatabaseError, NotFoundError, ValidationError, sanitize_error_message
+from app.core.cache import invalidate_financial_reports
 from app.core.invoice_utils import (
     generate_invoice_number, calculate_due_date, build_invoice_items,
     validate_invoice_status, update_invoice_status_if_overdue
@@ -111,6 +112,8 @@ async def update_stationery_item(
         # Update only provided fields
         update_data = {k: v for k, v in item_data.model_dump().items() if v is not None}
         response = db.table("stationery_items").update(update_data).eq("id", item_id).execute()
+        # Stationery costs in reports use the current unit price
+        invalidate_financial_reports()
         
         logger.info(f"Stationery item updated: {item_id}")
         return StationeryItemResponse(**response.data[0])
@@ -175,6 +178,7 @@ async def distribute_stationery(
         distribution_record["distributed_by"] = current_user["sub"]
         
         response = db.table("stationery_distributions").insert(distribution_record).execute()
+        invalidate_financial_reports()
         
         # Update item quantity
         new_quantity = item.data[0]["quantity"] - distribution_data.quantity
@@ -236,6 +240,7 @@ async def create_salary_record(
         logger.debug(f"Calculated net salary: {net_salary}")
         
         response = db.table("salary_records").insert(salary_record).execute()
+        invalidate_financial_reports()
         logger.info(f"Salary record created successfully: {response.data[0].get('id')}")
         return SalaryRecordResponse(**response.data[0])
     except HTTPException:
@@ -298,6 +303,7 @@ async def update_salary_record(
             update_data["net_salary"] = basic_salary + bonuses - deductions
         
         response = db.table("salary_records").update(update_data).eq("id", salary_id).execute()
+        invalidate_financial_reports()
         logger.info(f"Salary record updated: {salary_id}")
         return SalaryRecordResponse(**response.data[0])
     except NotFoundError:
@@ -325,6 +331,7 @@ async def delete_salary_record(
             raise NotFoundError(f"Salary record with ID {salary_id} not found", error_code="SALARY_NOT_FOUND")
         
         db.table("salary_records").delete().eq("id", salary_id).execute()
+        invalidate_financial_reports()
         logger.info(f"Salary record deleted: {salary_id}")
         return {"message": "Salary record deleted successfully"}
     except NotFoundError:
@@ -353,6 +360,7 @@ async def create_expense(
         expense_record["recorded_by"] = current_user["sub"]
         
         response = db.table("expenses").insert(expense_record).execute()
+        invalidate_financial_reports()
         logger.info(f"Expense created successfully: {response.data[0].get('id')}")
         return ExpenseResponse(**response.data[0])
     except HTTPException:
@@ -409,6 +417,7 @@ async def update_expense(
         update_data = {k: v for k, v in expense_data.model_dump().items() if v is not None}
         
         response = db.table("expenses").update(update_data).eq("id", expense_id).execute()
+        invalidate_financial_reports()
         logger.info(f"Expense updated successfully: {expense_id}")
         return ExpenseResponse(**response.data[0])
     except NotFoundError:
@@ -436,6 +445,7 @@ async def delete_expense(
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Expense not found")
         
         db.table("expenses").delete().eq("id", expense_id).execute()
+        invalidate_financial_reports()
         return {"message": "Expense deleted successfully"}
     except HTTPException:
         raise
@@ -458,6 +468,7 @@ async def create_donation(
         donation_record = donation_data.model_dump()
         
         response = db.table("donations").insert(donation_record).execute()
+        invalidate_financial_reports()
         logger.info(f"Donation created successfully: {response.data[0].get('id')}")
         return DonationResponse(**response.data[0])
     except HTTPException:
@@ -511,6 +522,7 @@ async def update_donation(
         update_data = {k: v for k, v in donation_data.model_dump().items() if v is not None}
         
         response = db.table("donations").update(update_data).eq("id", donation_id).execute()
+        invalidate_financial_reports()
         logger.info(f"Donation updated successfully: {donation_id}")
         return DonationResponse(**response.data[0])
     except NotFoundError:
@@ -538,6 +550,7 @@ async def delete_donation(
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Donation not found")
         
         db.table("donations").delete().eq("id", donation_id).execute()
+        invalidate_financial_reports()
         return {"message": "Donation deleted successfully"}
     except HTTPException:
         raise
@@ -910,9 +923,9 @@ async def get_financial_summary(
         from app.core.financial_reporting import FinancialReportGenerator
         
         db = get_request_scoped_client(current_user.get("access_token"), True)
-        generator = FinancialReportGenerator(db)
+        generator = FinancialReportGenerator(db, cache_scope=current_user.get("sub"))
         
-        report = generator.generate_report(
+        report = await generator.generate_report(
             report_type=report_type,
             date_from=date_from,
             date_to=date_to,
@@ -941,9 +954,9 @@ async def generate_financial_report(
         from app.core.financial_reporting import FinancialReportGenerator
         
         db = get_request_scoped_client(current_user.get("access_token"), True)
-        generator = FinancialReportGenerator(db)
+        generator = FinancialReportGenerator(db, cache_scope=current_user.get("sub"))
         
-        report = generator.generate_report(
+        report = await generator.generate_report(
             report_type=report_request.report_type,
             date_from=report_request.date_from,
             date_to=report_request.date_to,
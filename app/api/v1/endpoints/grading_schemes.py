@@ -8,6 +8,7 @@ from app.models.grading_scheme import (
 from app.core.supabase import supabase_admin, get_request_scoped_client
 from app.core.security import require_role, get_current_user
 from app.core.logging_config import get_logger
+from app.core.grading_utils import invalidate_grading_scheme_cache
 from app.core.exceptions import (
     DatabaseError,
     NotFoundError,
@@ -66,6 +67,7 @@ async def create_grading_scheme(
         
         if criteria_to_insert:
             criteria_response = db.table("grading_criteria").insert(criteria_to_insert).execute()
+            invalidate_grading_scheme_cache()
             logger.info(f"Created grading scheme '{scheme_data.name}' with {len(criteria_to_insert)} criteria")
         else:
             # Delete scheme if no criteria
@@ -229,6 +231,7 @@ async def update_grading_scheme(
         
         if not response.data or len(response.data) == 0:
             raise DatabaseError("Failed to update grading scheme", error_code="SCHEME_UPDATE_FAILED")
+        invalidate_grading_scheme_cache()
         
         # Fetch updated scheme with criteria
         scheme = response.data[0]
@@ -284,6 +287,7 @@ async def update_grading_scheme_criteria(
             raise ValidationError("At least one grading criterion is required", error_code="NO_CRITERIA")
         
         db.table("grading_criteria").insert(criteria_to_insert).execute()
+        invalidate_grading_scheme_cache()
         
         # Update scheme updated_by
         db.table("grading_schemes").update({"updated_by": current_user.get("sub")}).eq("id", scheme_id).execute()
@@ -331,6 +335,7 @@ async def delete_grading_scheme(
         
         # Delete scheme
         db.table("grading_schemes").delete().eq("id", scheme_id).execute()
+        invalidate_grading_scheme_cache()
         
         logger.info(f"Deleted grading scheme {scheme_id}")
         return {"message": "Grading scheme deleted successfully"}
@@ -33,19 +33,20 @@ async def get_academic_report(
         grades_response = query.execute()
         grades = grades_response.data
         
+        # Counts only: head=True skips the response body
         # Get students count
-        students_query = db.table("students").select("id", count="exact")
+        students_query = db.table("students").select("id", count="exact", head=True)
         if class_id:
             students_query = students_query.eq("class_id", class_id)
         students_response = students_query.execute()
         total_students = students_response.count or len(students_response.data)
         
         # Get teachers count
-        teachers_response = db.table("teachers").select("id", count="exact").execute()
+        teachers_response = db.table("teachers").select("id", count="exact", head=True).execute()
         total_teachers = teachers_response.count or 0
         
         # Get classes count
-        classes_query = db.table("classes").select("id", count="exact")
+        classes_query = db.table("classes").select("id", count="exact", head=True)
         if academic_year:
             classes_query = classes_query.eq("academic_year", academic_year)
         classes_response = classes_query.execute()
@@ -276,8 +277,9 @@ async def get_financial_report(
     try:
         db = get_request_scoped_client(current_user.get("access_token"), True)
         
+        # Only the columns summed below
         # Get expenses
-        expenses_query = db.table("expenses").select("*")
+        expenses_query = db.table("expenses").select("amount, category, date")
         if date_from:
             expenses_query = expenses_query.gte("date", date_from)
         if date_to:
@@ -286,7 +288,7 @@ async def get_financial_report(
         expenses = expenses_response.data
         
         # Get donations
-        donations_query = db.table("donations").select("*")
+        donations_query = db.table("donations").select("amount, date")
         if date_from:
             donations_query = donations_query.gte("date", date_from)
         if date_to:
@@ -295,7 +297,7 @@ async def get_financial_report(
         donations = donations_response.data
         
         # Get salary records
-        salary_query = db.table("salary_records").select("*")
+        salary_query = db.table("salary_records").select("net_salary, paid_date")
         if date_from:
             salary_query = salary_query.gte("paid_date", date_from)
         if date_to:
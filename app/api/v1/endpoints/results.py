@@ -22,7 +22,7 @@ from app.core.exceptions import (
     ValidationError,
     sanitize_error_message
 )
-from app.core.grading_utils import calculate_grade, get_active_grading_scheme
+from app.core.grading_utils import calculate_grade, calculate_grades_bulk, get_active_grading_scheme
 
 logger = get_logger(__name__)
 router = APIRouter()
@@ -268,6 +268,8 @@ async def bulk_upload_results(
         total_marks = exam.get("total_marks", 100.0)
         
         results_to_insert = []
+        # (record, percentage) pairs graded in one batch after validation
+        pending_grades = []
         errors = []
         success_count = 0
         
@@ -314,22 +316,20 @@ async def bulk_upload_results(
                         })
                         continue
                 
-                # Calculate grade
-                percentage = (entry.marks_obtained / total_marks) * 100
-                grade = calculate_grade(percentage, criteria=criteria) if not entry.remarks else None
-                
                 result_record = {
                     "exam_id": bulk_data.exam_id,
                     "student_id": student["id"],
                     "marks_obtained": float(entry.marks_obtained),
                     "total_marks": total_marks,
-                    "grade": grade,
+                    "grade": None,
                     "status": entry.status.value if isinstance(entry.status, ResultStatus) else entry.status,
                     "remarks": entry.remarks,
                     "uploaded_by": current_user["sub"]
                 }
                 
                 results_to_insert.append(result_record)
+                if not entry.remarks:
+                    pending_grades.append((result_record, (entry.marks_obtained / total_marks) * 100))
                 success_count += 1
                 
             except Exception as e:
@@ -345,6 +345,11 @@ async def bulk_upload_results(
                 error_code="NO_VALID_RESULTS"
             )
         
+        # Calculate grades for the whole upload at once
+        grades = calculate_grades_bulk([percentage for _, percentage in pending_grades], criteria=criteria)
+        for (result_record, _), grade in zip(pending_grades, grades):
+            result_record["grade"] = grade
+        
         # Insert results (upsert if overwrite_existing)
         inserted_count = 0
         for result in results_to_insert:
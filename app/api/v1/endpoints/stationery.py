@@ -8,6 +8,7 @@ from decimal import Decimal
 
 from app.core.supabase import supabase_admin, get_request_scoped_client
 from app.core.security import get_current_user, require_role
+from app.core.cache import invalidate_financial_reports
 from app.models.stationery import (
     StationeryItemCreate, StationeryItemUpdate, StationeryItemResponse,
     StationeryDistributionCreate, StationeryDistributionUpdate, StationeryDistributionResponse
@@ -106,6 +107,8 @@ async def update_stationery_item(
             )
         
         response = supabase_admin.table("stationery_items").update(update_data).eq("id", item_id).execute()
+        # Stationery costs in reports use the current unit price
+        invalidate_financial_reports()
         
         if not response.data:
             raise HTTPException(
@@ -204,6 +207,7 @@ async def create_stationery_distribution(
         distribution_record["distributed_by"] = current_user["id"]
         
         response = supabase_admin.table("stationery_distributions").insert(distribution_record).execute()
+        invalidate_financial_reports()
         distribution = response.data[0]
         
         # Update stock quantity
@@ -1,15 +1,22 @@
 from fastapi import APIRouter, HTTPException, status, Depends, Query
 from typing import Optional
+import asyncio
+from pydantic import TypeAdapter
+from postgrest.types import CountMethod, ReturnMethod
 from app.models.student import StudentCreate, StudentUpdate, StudentResponse
 from app.models.user import UserResponse
-from app.core.supabase import supabase, supabase_admin, get_request_scoped_client
+from app.core.supabase import supabase, supabase_admin, get_request_scoped_client, Client
+from app.core.supabase_helpers import scoped_db
 from app.core.security import get_current_user, require_role
 from app.core.logging_config import get_logger
-from app.core.response_helpers import populate_student_user_data
+from app.core.response_helpers import populate_student_user_data, validated_json_response
+from app.core.cache import invalidate_user
 
 router = APIRouter()
 logger = get_logger(__name__)
 
+_STUDENT_LIST = TypeAdapter(list[StudentResponse])
+
 
 @router.post("", response_model=StudentResponse, status_code=status.HTTP_201_CREATED)
 async def create_student(
@@ -18,16 +25,19 @@ async def create_student(
 ):
     """Create a new student"""
     try:
-        # Create user account
-        auth_response = supabase_admin.auth.admin.create_user({
-            "email": student_data.email,
-            "password": student_data.password,
-            "email_confirm": True,
-            "user_metadata": {
-                "full_name": student_data.full_name,
-                "role": "student"
+        # Create user account (sync admin SDK, run off the event loop)
+        auth_response = await asyncio.to_thread(
+            supabase_admin.auth.admin.create_user,
+            {
+                "email": student_data.email,
+                "password": student_data.password,
+                "email_confirm": True,
+                "user_metadata": {
+                    "full_name": student_data.full_name,
+                    "role": "student"
+                }
             }
-        })
+        )
         
         if not auth_response.user:
             raise HTTPException(
@@ -37,38 +47,41 @@ async def create_student(
         
         user_id = auth_response.user.id
         
-        # Create profile
-        profile_data = {
-            "user_id": user_id,
-            "full_name": student_data.full_name,
-            "phone": student_data.phone,
-            "address": student_data.address,
-        }
         db = get_request_scoped_client(current_user.get("access_token"), True)
-        db.table("profiles").insert(profile_data).execute()
-        
-        # Create student record
-        student_record = {
-            "user_id": user_id,
-            "admission_number": student_data.admission_number,
-            "admission_date": student_data.admission_date,  # Already a string from frontend
-            "class_id": student_data.class_id,
-            "guardian_info": student_data.guardian_info.model_dump(),
-            "status": "active"
-        }
-        
-        response = db.table("students").insert(student_record).execute()
         
-        if not response.data or len(response.data) == 0:
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Failed to create student record"
+        # Profile + student rows are written in one transaction by the create_student RPC
+        try:
+            response = await asyncio.to_thread(
+                db.rpc("create_student", {
+                    "p_user_id": user_id,
+                    "p_full_name": student_data.full_name,
+                    "p_phone": student_data.phone,
+                    "p_address": student_data.address,
+                    "p_admission_number": student_data.admission_number,
+                    "p_admission_date": student_data.admission_date,  # Already a string from frontend
+                    "p_class_id": student_data.class_id,
+                    "p_guardian": student_data.guardian_info.model_dump(),
+                }).execute
             )
-        
-        student = response.data[0]
+            
+            if not response.data:
+                raise HTTPException(
+                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    detail="Failed to create student record"
+                )
+        except Exception:
+            # The RPC is atomic, so only the auth account needs rolling back
+            try:
+                await asyncio.to_thread(supabase_admin.auth.admin.delete_user, user_id)
+            except Exception as cleanup_error:
+                logger.error(f"Failed to roll back auth user {user_id}: {str(cleanup_error)}")
+            raise
+        
+        invalidate_user()
+        student = response.data[0] if isinstance(response.data, list) else response.data
         
         # Populate user data
-        students_data = populate_student_user_data(
+        students_data = await populate_student_user_data(
             [student], 
             db, 
             current_user
@@ -99,18 +112,22 @@ async def create_student(
         )
 
 
-@router.get("", response_model=list[StudentResponse])
+@router.get(
+    "",
+    response_model=None,
+    responses={200: {"model": list[StudentResponse]}}
+)
 async def list_students(
     class_id: Optional[str] = Query(None),
     search: Optional[str] = Query(None),
     status: Optional[str] = Query(None),
     limit: int = Query(50, le=1000),
     offset: int = Query(0),
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    db: Client = Depends(scoped_db)
 ):
     """List all students with optional filters"""
     try:
-        db = get_request_scoped_client(current_user.get("access_token"), current_user.get("role") in ["admin","principal"])
         query = db.table("students").select("*")
         
         if class_id:
@@ -127,13 +144,13 @@ async def list_students(
         response = query.execute()
         
         # Populate user data for each student
-        students_data = populate_student_user_data(
+        students_data = await populate_student_user_data(
             response.data, 
             db, 
             current_user
         )
         
-        return [StudentResponse(**student) for student in students_data]
+        return validated_json_response(_STUDENT_LIST, students_data)
         
     except Exception as e:
         raise HTTPException(
@@ -144,15 +161,12 @@ async def list_students(
 
 @router.get("/me/profile")
 async def get_my_student_profile(
-    current_user: dict = Depends(require_role(["student"]))
+    current_user: dict = Depends(require_role(["student"])),
+    db: Client = Depends(scoped_db)
 ):
     """Get current student's profile"""
     try:
         user_id = current_user["sub"]
-        db = get_request_scoped_client(
-            current_user.get("access_token"),
-            current_user.get("role") in ["admin", "principal"]
-        )
         
         response = db.table("students").select("*").eq("user_id", user_id).single().execute()
         student = response.data
@@ -194,11 +208,11 @@ async def get_my_student_profile(
 @router.get("/{student_id}", response_model=StudentResponse)
 async def get_student(
     student_id: str,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    db: Client = Depends(scoped_db)
 ):
     """Get student by ID"""
     try:
-        db = get_request_scoped_client(current_user.get("access_token"), current_user.get("role") in ["admin","principal"])
         response = db.table("students").select("*").eq("id", student_id).single().execute()
         student = response.data
         
@@ -209,7 +223,7 @@ async def get_student(
             )
         
         # Populate user data
-        students_data = populate_student_user_data(
+        students_data = await populate_student_user_data(
             [student], 
             db, 
             current_user
@@ -231,15 +245,14 @@ async def get_student(
 async def update_student(
     student_id: str,
     student_data: StudentUpdate,
-    current_user: dict = Depends(require_role(["admin", "principal", "teacher"]))
+    current_user: dict = Depends(require_role(["admin", "principal", "teacher"])),
+    db: Client = Depends(scoped_db)
 ):
     """Update student information"""
     try:
-        db = get_request_scoped_client(current_user.get("access_token"), current_user.get("role") in ["admin","principal"])
-        
-        # Get student to find user_id
-        student_response = db.table("students").select("*").eq("id", student_id).single().execute()
-        student = student_response.data
+        # Only user_id is needed to confirm the student exists and update the profile
+        student_response = db.table("students").select("user_id").eq("id", student_id).maybe_single().execute()
+        student = student_response.data if student_response else None
         
         if not student:
             raise HTTPException(
@@ -259,6 +272,7 @@ async def update_student(
             
             if profile_update:
                 db.table("profiles").update(profile_update).eq("user_id", student["user_id"]).execute()
+                invalidate_user(student["user_id"])
         
         # Update student record
         update_data = student_data.model_dump(exclude_unset=True, exclude={"full_name", "phone", "address"})
@@ -271,7 +285,7 @@ async def update_student(
             updated_student = response.data[0]
             
             # Populate user data
-            students_data = populate_student_user_data(
+            students_data = await populate_student_user_data(
                 [updated_student], 
                 db, 
                 current_user
@@ -280,8 +294,11 @@ async def update_student(
             
             return StudentResponse(**updated_student)
         
+        # Nothing to update on the student row itself, so fetch it for the response
+        student = db.table("students").select("*").eq("id", student_id).single().execute().data
+        
         # Populate user data for existing student
-        students_data = populate_student_user_data(
+        students_data = await populate_student_user_data(
             [student], 
             db, 
             current_user
@@ -307,11 +324,23 @@ async def delete_student(
     """Deactivate student"""
     try:
         db = get_request_scoped_client(current_user.get("access_token"), True)
-        # Update status to inactive
-        db.table("students").update({"status": "inactive"}).eq("id", student_id).execute()
+        # Update status to inactive; only the affected row count is returned
+        response = db.table("students").update(
+            {"status": "inactive"},
+            count=CountMethod.exact,
+            returning=ReturnMethod.minimal
+        ).eq("id", student_id).execute()
+        
+        if not response.count:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Student not found"
+            )
         
         return {"message": "Student deactivated successfully"}
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -1,67 +1,138 @@
-from fastapi import APIRouter, HTTPException, status, Depends, Query
-from typing import Optional, List
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Request
+from fastapi.responses import StreamingResponse
+from typing import Optional, List, Iterator
+import orjson
+from pydantic import TypeAdapter
 from app.models.syllabus import (
     SyllabusCreate, SyllabusUpdate, SyllabusResponse, SyllabusStats
 )
-from app.core.supabase import get_request_scoped_client
-from app.core.security import get_current_user, require_role
+from app.core.supabase import get_request_scoped_client, Client
+from app.core.supabase_helpers import scoped_db
+from app.core.security import require_role
+from app.core.response_helpers import validated_json_response
+from app.core.logging_config import get_logger
 
+logger = get_logger(__name__)
 router = APIRouter()
 
+_SYLLABUS_LIST = TypeAdapter(list[SyllabusResponse])
 
-@router.get("", response_model=List[SyllabusResponse])
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+STREAM_PAGE_SIZE = 20
+
+
+def _build_syllabus_query(
+    db,
+    class_id: Optional[str],
+    subject: Optional[str],
+    term: Optional[str],
+    year: Optional[int]
+):
+    """Build the filtered and ordered syllabus query (id breaks ties, so pages never overlap)"""
+    query = db.table("syllabuses").select("*")
+    
+    if class_id:
+        query = query.eq("class_id", class_id)
+    
+    if subject:
+        query = query.eq("subject", subject)
+    
+    if term:
+        query = query.eq("term", term)
+    
+    if year:
+        query = query.eq("year", year)
+    
+    return query.order("year", desc=True).order("term").order("id")
+
+
+# Last NDJSON line when a page fails mid-stream (same shape as the app's error
+# responses), so clients can tell an interrupted stream from a complete one
+_STREAM_ERROR_LINE = orjson.dumps({
+    "error": True,
+    "message": "Failed to fetch syllabuses",
+    "error_code": "STREAM_INTERRUPTED",
+    "details": None
+}) + b"\n"
+
+
+def _stream_syllabuses(db, filters: dict, limit: int, offset: int, first_page) -> Iterator[bytes]:
+    """
+    Yield syllabuses as NDJSON lines, fetching STREAM_PAGE_SIZE rows at a time
+    
+    first_page is fetched by the caller, so a failing query is still reported
+    with an error status; a later failure ends the stream with _STREAM_ERROR_LINE.
+    """
+    end = offset + limit
+    page = first_page
+    for page_offset in range(offset, end, STREAM_PAGE_SIZE):
+        page_size = min(STREAM_PAGE_SIZE, end - page_offset)
+        if page is None:
+            try:
+                page = _build_syllabus_query(db, **filters).limit(page_size).offset(page_offset).execute()
+            except Exception:
+                logger.exception(f"Syllabus stream failed at offset {page_offset}")
+                yield _STREAM_ERROR_LINE
+                return
+        for row in page.data:
+            yield orjson.dumps(row) + b"\n"
+        if len(page.data) < page_size:
+            break
+        page = None
+
+
+@router.get(
+    "",
+    response_model=None,
+    responses={200: {"model": List[SyllabusResponse]}}
+)
 async def get_syllabuses(
+    request: Request,
     class_id: Optional[str] = Query(None),
     subject: Optional[str] = Query(None),
     term: Optional[str] = Query(None),
     year: Optional[int] = Query(None),
     limit: int = Query(50, le=100),
     offset: int = Query(0),
-    current_user: dict = Depends(get_current_user)
+    db: Client = Depends(scoped_db)
 ):
-    """Get syllabuses with optional filters"""
+    """Get syllabuses with optional filters.
+    
+    Clients sending `Accept: application/x-ndjson` receive a streamed response
+    with one syllabus per line, fetched from the database in small pages.
+    """
     try:
-        db = get_request_scoped_client(
-            current_user.get("access_token"),
-            current_user.get("role") in ["admin", "principal"]
-        )
-        
-        query = db.table("syllabuses").select("*")
-        
-        if class_id:
-            query = query.eq("class_id", class_id)
-        
-        if subject:
-            query = query.eq("subject", subject)
-        
-        if term:
-            query = query.eq("term", term)
+        filters = {"class_id": class_id, "subject": subject, "term": term, "year": year}
         
-        if year:
-            query = query.eq("year", year)
+        if NDJSON_MEDIA_TYPE in request.headers.get("accept", ""):
+            first_page = _build_syllabus_query(db, **filters)\
+                .limit(min(STREAM_PAGE_SIZE, limit)).offset(offset).execute()
+            return StreamingResponse(
+                _stream_syllabuses(db, filters, limit, offset, first_page),
+                media_type=NDJSON_MEDIA_TYPE
+            )
         
-        query = query.order("year", desc=True).order("term").limit(limit).offset(offset)
+        query = _build_syllabus_query(db, **filters).limit(limit).offset(offset)
         
         response = query.execute()
-        return [SyllabusResponse(**item) for item in response.data]
+        return validated_json_response(_SYLLABUS_LIST, response.data)
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
 
-@router.get("/class/{class_id}", response_model=List[SyllabusResponse])
+@router.get(
+    "/class/{class_id}",
+    response_model=None,
+    responses={200: {"model": List[SyllabusResponse]}}
+)
 async def get_class_syllabuses(
     class_id: str,
-    current_user: dict = Depends(get_current_user)
+    db: Client = Depends(scoped_db)
 ):
     """Get all syllabuses for a specific class"""
     try:
-        db = get_request_scoped_client(
-            current_user.get("access_token"),
-            current_user.get("role") in ["admin", "principal"]
-        )
-        
         response = db.table("syllabuses").select("*").eq("class_id", class_id).order("year", desc=True).order("term").execute()
-        return [SyllabusResponse(**item) for item in response.data]
+        return validated_json_response(_SYLLABUS_LIST, response.data)
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
@@ -69,15 +140,10 @@ async def get_class_syllabuses(
 @router.get("/{syllabus_id}", response_model=SyllabusResponse)
 async def get_syllabus(
     syllabus_id: str,
-    current_user: dict = Depends(get_current_user)
+    db: Client = Depends(scoped_db)
 ):
     """Get a specific syllabus"""
     try:
-        db = get_request_scoped_client(
-            current_user.get("access_token"),
-            current_user.get("role") in ["admin", "principal"]
-        )
-        
         response = db.table("syllabuses").select("*").eq("id", syllabus_id).execute()
         
         if not response.data:
@@ -1,33 +1,53 @@
-from fastapi import APIRouter, HTTPException, status, Depends, Query
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Response
 from typing import Optional
-from datetime import date
+import asyncio
+from pydantic import TypeAdapter
 from app.models.teacher import TeacherCreate, TeacherUpdate, TeacherResponse
 from app.core.supabase import supabase, supabase_admin, get_request_scoped_client
 from app.core.security import get_current_user, require_role
+from app.core.supabase_helpers import _PRIVILEGED_ROLES
 from app.core.logging_config import get_logger
-from app.core.response_helpers import populate_teacher_user_data
+from app.core.response_helpers import populate_teacher_user_data, validated_json_response
+from app.core.pagination import NEXT_CURSOR_HEADER, decode_cursor, apply_keyset, next_cursor
+from app.core.cache import (
+    ME_CACHE_CONTROL, teacher_profile_cache, teacher_classes_cache,
+    invalidate_teacher_profile, invalidate_user
+)
 
 router = APIRouter()
 logger = get_logger(__name__)
 
+# Role dependencies, built once so routes share the same callables
+_admin_principal = require_role(["admin", "principal"])
+_admin_only = require_role(["admin"])
+_teacher_only = require_role(["teacher"])
+
+_TEACHER_LIST = TypeAdapter(list[TeacherResponse])
+
+# Only the columns TeacherResponse exposes ("user" is populated separately)
+_TEACHER_COLUMNS = ",".join(name for name in TeacherResponse.model_fields if name != "user")
+
 
 @router.post("", response_model=TeacherResponse, status_code=status.HTTP_201_CREATED)
 async def create_teacher(
     teacher_data: TeacherCreate,
-    current_user: dict = Depends(require_role(["admin", "principal"]))
+    current_user: dict = Depends(_admin_principal)
 ):
     """Create a new teacher"""
     try:
-        # Create user account
-        auth_response = supabase_admin.auth.admin.create_user({
-            "email": teacher_data.email,
-            "password": teacher_data.password,
-            "email_confirm": True,
-            "user_metadata": {
-                "full_name": teacher_data.full_name,
-                "role": "teacher"
+        # Create user account (sync admin SDK, run off the event loop)
+        auth_response = await asyncio.to_thread(
+            supabase_admin.auth.admin.create_user,
+            {
+                "email": teacher_data.email,
+                "password": teacher_data.password,
+                "email_confirm": True,
+                "user_metadata": {
+                    "full_name": teacher_data.full_name,
+                    "role": "teacher"
+                }
             }
-        })
+        )
         
         if not auth_response.user:
             raise HTTPException(
@@ -37,7 +57,6 @@ async def create_teacher(
         
         user_id = auth_response.user.id
         
-        # Create profile
         profile_data = {
             "user_id": user_id,
             "full_name": teacher_data.full_name,
@@ -45,47 +64,45 @@ async def create_teacher(
             "address": teacher_data.address,
         }
         db = get_request_scoped_client(current_user.get("access_token"), True)
-        db.table("profiles").insert(profile_data).execute()
-        
-        # Create teacher record
-        # Handle join_date - convert date object to ISO string if needed
-        join_date_value = teacher_data.join_date
-        if isinstance(join_date_value, date):
-            join_date_value = join_date_value.isoformat()
-        elif not isinstance(join_date_value, str):
-            join_date_value = str(join_date_value)
-        
-        teacher_record = {
-            "user_id": user_id,
-            "employee_id": teacher_data.employee_id,
-            "join_date": join_date_value,
-            "qualification": teacher_data.qualification,
-            "subjects": teacher_data.subjects,
-            "salary_info": teacher_data.salary_info.model_dump(),
-            "status": "active",
-            "cnic_number": teacher_data.cnic_number,
-            "experience_years": teacher_data.experience_years or 0,
-            "contact_number": teacher_data.contact_number,
-            "home_address": teacher_data.home_address,
-            "cnic_copy_url": teacher_data.cnic_copy_url,
-            "degree_copy_url": teacher_data.degree_copy_url,
-            "remarks": teacher_data.remarks
-        }
-        # Remove None values
-        teacher_record = {k: v for k, v in teacher_record.items() if v is not None}
         
-        response = db.table("teachers").insert(teacher_record).execute()
+        # Build teacher record (JSON mode: join_date as ISO string, salary_info as dict;
+        # unset optional columns are left out)
+        teacher_record = teacher_data.model_dump(
+            mode="json",
+            exclude_none=True,
+            exclude={"email", "password", "full_name", "phone", "address"}
+        )
+        teacher_record.update(
+            user_id=user_id,
+            status="active",
+            experience_years=teacher_data.experience_years or 0
+        )
         
-        if not response.data or len(response.data) == 0:
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Failed to create teacher record"
+        # Profile and teacher rows only depend on user_id, so insert them concurrently
+        try:
+            _, response = await asyncio.gather(
+                asyncio.to_thread(db.table("profiles").insert(profile_data).execute),
+                asyncio.to_thread(db.table("teachers").insert(teacher_record).execute)
             )
-        
+            
+            if not response.data or len(response.data) == 0:
+                raise HTTPException(
+                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    detail="Failed to create teacher record"
+                )
+        except Exception:
+            # Roll back the auth account; profile/teacher rows cascade from auth.users
+            try:
+                await asyncio.to_thread(supabase_admin.auth.admin.delete_user, user_id)
+            except Exception as cleanup_error:
+                logger.error(f"Failed to roll back auth user {user_id}: {str(cleanup_error)}")
+            raise
+        
+        invalidate_user()
         teacher = response.data[0]
         
         # Populate user data
-        teachers_data = populate_teacher_user_data(
+        teachers_data = await populate_teacher_user_data(
             [teacher], 
             db, 
             current_user
@@ -116,18 +133,24 @@ async def create_teacher(
         )
 
 
-@router.get("", response_model=list[TeacherResponse])
+@router.get(
+    "",
+    response_model=None,
+    responses={200: {"model": list[TeacherResponse]}}
+)
 async def list_teachers(
     search: Optional[str] = Query(None),
     status: Optional[str] = Query(None),
     limit: int = Query(50, le=1000),
     offset: int = Query(0),
+    cursor: Optional[str] = Query(None, description="Value of X-Next-Cursor from the previous page (replaces offset)"),
     current_user: dict = Depends(get_current_user)
 ):
-    """List all teachers with optional filters"""
+    """List all teachers with optional filters, newest first"""
+    after = decode_cursor(cursor)
     try:
-        db = get_request_scoped_client(current_user.get("access_token"), current_user.get("role") in ["admin","principal"])
-        query = db.table("teachers").select("*")
+        db = get_request_scoped_client(current_user.get("access_token"), current_user.get("role") in _PRIVILEGED_ROLES)
+        query = db.table("teachers").select(_TEACHER_COLUMNS)
         
         if status:
             query = query.eq("status", status)
@@ -135,17 +158,25 @@ async def list_teachers(
         if search:
             query = query.ilike("employee_id", f"%{search}%")
         
-        query = query.range(offset, offset + limit - 1)
-        response = query.execute()
+        query = apply_keyset(query, after)
+        if after:
+            query = query.limit(limit)
+        else:
+            query = query.range(offset, offset + limit - 1)
+        response = await asyncio.to_thread(query.execute)
         
         # Populate user data for each teacher
-        teachers_data = populate_teacher_user_data(
+        teachers_data = await populate_teacher_user_data(
             response.data, 
             db, 
             current_user
         )
         
-        return [TeacherResponse(**teacher) for teacher in teachers_data]
+        result = validated_json_response(_TEACHER_LIST, teachers_data)
+        cursor_value = next_cursor(teachers_data, limit)
+        if cursor_value:
+            result.headers[NEXT_CURSOR_HEADER] = cursor_value
+        return result
         
     except Exception as e:
         raise HTTPException(
@@ -156,18 +187,25 @@ async def list_teachers(
 
 @router.get("/me/profile")
 async def get_my_teacher_profile(
-    current_user: dict = Depends(require_role(["teacher"]))
+    response: Response,
+    current_user: dict = Depends(_teacher_only)
 ):
     """Get current teacher's profile"""
     try:
         user_id = current_user["sub"]
+        response.headers["Cache-Control"] = ME_CACHE_CONTROL
+        
+        cached = teacher_profile_cache.get(user_id)
+        if cached is not None:
+            return cached
+        
         db = get_request_scoped_client(
             current_user.get("access_token"),
-            current_user.get("role") in ["admin", "principal"]
+            current_user.get("role") in _PRIVILEGED_ROLES
         )
         
-        response = db.table("teachers").select("*").eq("user_id", user_id).single().execute()
-        teacher = response.data
+        teacher_response = await asyncio.to_thread(db.table("teachers").select("*").eq("user_id", user_id).single().execute)
+        teacher = teacher_response.data
         
         if not teacher:
             raise HTTPException(
@@ -175,7 +213,9 @@ async def get_my_teacher_profile(
                 detail="Teacher profile not found"
             )
         
-        return TeacherResponse(**teacher)
+        profile = TeacherResponse(**teacher)
+        teacher_profile_cache[user_id] = profile
+        return profile
         
     except HTTPException:
         raise
@@ -188,23 +228,31 @@ async def get_my_teacher_profile(
 
 @router.get("/me/classes")
 async def get_my_classes(
-    current_user: dict = Depends(require_role(["teacher"]))
+    response: Response,
+    current_user: dict = Depends(_teacher_only)
 ):
     """Get classes assigned to current teacher"""
     try:
         user_id = current_user["sub"]
+        response.headers["Cache-Control"] = ME_CACHE_CONTROL
+        
+        cached = teacher_classes_cache.get(user_id)
+        if cached is not None:
+            return cached
+        
         db = get_request_scoped_client(
             current_user.get("access_token"),
-            current_user.get("role") in ["admin", "principal"]
+            current_user.get("role") in _PRIVILEGED_ROLES
         )
         
         # Get teacher ID
-        teacher_response = db.table("teachers").select("id").eq("user_id", user_id).single().execute()
+        teacher_response = await asyncio.to_thread(db.table("teachers").select("id").eq("user_id", user_id).single().execute)
         teacher_id = teacher_response.data["id"]
         
         # Get assigned classes
-        classes_response = db.table("classes").select("*").eq("teacher_id", teacher_id).execute()
+        classes_response = await asyncio.to_thread(db.table("classes").select("*").eq("teacher_id", teacher_id).execute)
         
+        teacher_classes_cache[user_id] = classes_response.data
         return classes_response.data
         
     except Exception as e:
@@ -221,8 +269,8 @@ async def get_teacher(
 ):
     """Get teacher by ID"""
     try:
-        db = get_request_scoped_client(current_user.get("access_token"), current_user.get("role") in ["admin","principal"])
-        response = db.table("teachers").select("*").eq("id", teacher_id).single().execute()
+        db = get_request_scoped_client(current_user.get("access_token"), current_user.get("role") in _PRIVILEGED_ROLES)
+        response = await asyncio.to_thread(db.table("teachers").select("*").eq("id", teacher_id).single().execute)
         teacher = response.data
         
         if not teacher:
@@ -232,7 +280,7 @@ async def get_teacher(
             )
         
         # Populate user data
-        teachers_data = populate_teacher_user_data(
+        teachers_data = await populate_teacher_user_data(
             [teacher], 
             db, 
             current_user
@@ -257,21 +305,11 @@ async def update_teacher(
     current_user: dict = Depends(get_current_user)
 ):
     """Update teacher information"""
-    db = get_request_scoped_client(current_user.get("access_token"), current_user.get("role") in ["admin","principal"])
-    
-    # Check permissions
-    if current_user["role"] not in ["admin", "principal"]:
-        # Teachers can only update their own profile
-        teacher_response = db.table("teachers").select("user_id").eq("id", teacher_id).single().execute()
-        if teacher_response.data["user_id"] != current_user["sub"]:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Not authorized to update this teacher"
-            )
+    db = get_request_scoped_client(current_user.get("access_token"), current_user.get("role") in _PRIVILEGED_ROLES)
     
     try:
-        # Get teacher to find user_id
-        teacher_response = db.table("teachers").select("*").eq("id", teacher_id).single().execute()
+        # Get teacher's user_id for the permission check
+        teacher_response = await asyncio.to_thread(db.table("teachers").select("user_id").eq("id", teacher_id).single().execute)
         teacher = teacher_response.data
         
         if not teacher:
@@ -280,48 +318,55 @@ async def update_teacher(
                 detail="Teacher not found"
             )
         
-        # Update profile if needed
-        if teacher_data.full_name or teacher_data.phone or teacher_data.address:
-            profile_update = {}
-            if teacher_data.full_name:
-                profile_update["full_name"] = teacher_data.full_name
-            if teacher_data.phone:
-                profile_update["phone"] = teacher_data.phone
-            if teacher_data.address:
-                profile_update["address"] = teacher_data.address
-            
-            if profile_update:
-                db.table("profiles").update(profile_update).eq("user_id", teacher["user_id"]).execute()
-        
-        # Update teacher record
-        update_data = teacher_data.model_dump(exclude_unset=True, exclude={"full_name", "phone", "address"})
+        # Teachers can only update their own profile
+        if current_user["role"] not in _PRIVILEGED_ROLES and teacher["user_id"] != current_user["sub"]:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Not authorized to update this teacher"
+            )
         
-        if "salary_info" in update_data:
-            update_data["salary_info"] = update_data["salary_info"].model_dump()
+        # Profile fields
+        profile_update = {}
+        if teacher_data.full_name:
+            profile_update["full_name"] = teacher_data.full_name
+        if teacher_data.phone:
+            profile_update["phone"] = teacher_data.phone
+        if teacher_data.address:
+            profile_update["address"] = teacher_data.address
+        
+        # Teacher fields (nested salary_info is dumped to a dict as well)
+        update_data = teacher_data.model_dump(mode="json", exclude_unset=True, exclude={"full_name", "phone", "address"})
+        
+        # Update profile + teacher in one transaction; the function returns both rows
+        response = await asyncio.to_thread(
+            db.rpc("update_teacher_full", {
+                "p_teacher_id": teacher_id,
+                "p_profile": profile_update,
+                "p_teacher": update_data
+            }).execute
+        )
+        invalidate_teacher_profile(teacher["user_id"])
+        invalidate_user(teacher["user_id"])
         
-        if update_data:
-            response = db.table("teachers").update(update_data).eq("id", teacher_id).execute()
-            updated_teacher = response.data[0]
-            
-            # Populate user data
-            teachers_data = populate_teacher_user_data(
-                [updated_teacher], 
-                db, 
-                current_user
+        if not response.data:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Teacher not found"
             )
-            updated_teacher = teachers_data[0] if teachers_data else updated_teacher
-            
-            return TeacherResponse(**updated_teacher)
         
-        # Populate user data for existing teacher
-        teachers_data = populate_teacher_user_data(
-            [teacher], 
+        updated_teacher = response.data["teacher"]
+        profile = response.data.get("profile")
+        
+        # Populate user data (only the auth email still needs a lookup)
+        teachers_data = await populate_teacher_user_data(
+            [updated_teacher], 
             db, 
-            current_user
+            current_user,
+            profiles=[profile] if profile else None
         )
-        teacher = teachers_data[0] if teachers_data else teacher
+        updated_teacher = teachers_data[0] if teachers_data else updated_teacher
         
-        return TeacherResponse(**teacher)
+        return TeacherResponse(**updated_teacher)
         
     except HTTPException:
         raise
@@ -335,12 +380,15 @@ async def update_teacher(
 @router.delete("/{teacher_id}")
 async def delete_teacher(
     teacher_id: str,
-    current_user: dict = Depends(require_role(["admin"]))
+    current_user: dict = Depends(_admin_only)
 ):
     """Deactivate teacher"""
     try:
         db = get_request_scoped_client(current_user.get("access_token"), True)
-        db.table("teachers").update({"status": "inactive"}).eq("id", teacher_id).execute()
+        response = await asyncio.to_thread(db.table("teachers").update({"status": "inactive"}).eq("id", teacher_id).execute)
+        
+        for teacher in response.data or []:
+            invalidate_teacher_profile(teacher.get("user_id"))
         
         return {"message": "Teacher deactivated successfully"}
         
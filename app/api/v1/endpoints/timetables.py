@@ -1,34 +1,63 @@
 from fastapi import APIRouter, HTTPException, status, Depends, Query
 from typing import Optional, List
+import asyncio
+from pydantic import TypeAdapter
 from app.models.timetable import (
     TimetableCreate, TimetableUpdate, TimetableResponse,
     TimetableEntryCreate, TimetableEntryUpdate, TimetableEntryResponse
 )
 from app.core.supabase import get_request_scoped_client
 from app.core.security import get_current_user, require_role
+from app.core.supabase_helpers import _PRIVILEGED_ROLES
+from app.core.response_helpers import validated_json_response
+from app.core.pagination import NEXT_CURSOR_HEADER, decode_cursor, apply_keyset, next_cursor
 
 router = APIRouter()
 
+# Role dependency, built once so routes share the same callable
+_admin_principal = require_role(["admin", "principal"])
+
+_TIMETABLE_LIST = TypeAdapter(List[TimetableResponse])
+_TIMETABLE_ENTRY_LIST = TypeAdapter(List[TimetableEntryResponse])
+
+# Only the columns the response models expose
+_TIMETABLE_COLUMNS = ",".join(TimetableResponse.model_fields)
+_TIMETABLE_ENTRY_COLUMNS = ",".join(TimetableEntryResponse.model_fields)
+
+# Empty inner embed: filters to timetables the teacher appears in, once each,
+# without sending the matching entries back
+TEACHER_TIMETABLES_SELECT = f"{_TIMETABLE_COLUMNS},timetable_entries!inner()"
+
 
 # ==================== Timetables ====================
 
-@router.get("", response_model=List[TimetableResponse])
+@router.get(
+    "",
+    response_model=None,
+    responses={200: {"model": List[TimetableResponse]}}
+)
 async def get_timetables(
     class_id: Optional[str] = Query(None),
     teacher_id: Optional[str] = Query(None),
     status_filter: Optional[str] = Query(None),
     limit: int = Query(50, le=100),
     offset: int = Query(0),
+    cursor: Optional[str] = Query(None, description="Value of X-Next-Cursor from the previous page (replaces offset)"),
     current_user: dict = Depends(get_current_user)
 ):
-    """Get timetables with optional filters"""
+    """Get timetables with optional filters, newest first"""
+    after = decode_cursor(cursor)
     try:
         db = get_request_scoped_client(
             current_user.get("access_token"),
-            current_user.get("role") in ["admin", "principal"]
+            current_user.get("role") in _PRIVILEGED_ROLES
         )
         
-        query = db.table("timetables").select("*")
+        if teacher_id:
+            # Filter by teacher via an inner join on timetable_entries (single round trip)
+            query = db.table("timetables").select(TEACHER_TIMETABLES_SELECT).eq("timetable_entries.teacher_id", teacher_id)
+        else:
+            query = db.table("timetables").select(_TIMETABLE_COLUMNS)
         
         if class_id:
             query = query.eq("class_id", class_id)
@@ -36,20 +65,16 @@ async def get_timetables(
         if status_filter:
             query = query.eq("status", status_filter)
         
-        # Filter by teacher if provided (via timetable_entries)
-        if teacher_id:
-            # Get timetable IDs that have entries for this teacher
-            entries_response = db.table("timetable_entries").select("timetable_id").eq("teacher_id", teacher_id).execute()
-            timetable_ids = list(set([e["timetable_id"] for e in entries_response.data]))
-            if timetable_ids:
-                query = query.in_("id", timetable_ids)
-            else:
-                return []  # No timetables for this teacher
-        
-        query = query.order("created_at", desc=True).limit(limit).offset(offset)
-        
-        response = query.execute()
-        return [TimetableResponse(**item) for item in response.data]
+        query = apply_keyset(query, after).limit(limit)
+        if not after:
+            query = query.offset(offset)
+        
+        response = await asyncio.to_thread(query.execute)
+        result = validated_json_response(_TIMETABLE_LIST, response.data)
+        cursor_value = next_cursor(response.data, limit)
+        if cursor_value:
+            result.headers[NEXT_CURSOR_HEADER] = cursor_value
+        return result
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
@@ -63,15 +88,11 @@ async def get_class_timetable(
     try:
         db = get_request_scoped_client(
             current_user.get("access_token"),
-            current_user.get("role") in ["admin", "principal"]
+            current_user.get("role") in _PRIVILEGED_ROLES
         )
         
-        # Try to get final status first
-        response = db.table("timetables").select("*").eq("class_id", class_id).eq("status", "final").execute()
-        
-        if not response.data:
-            # If no final, get any timetable for the class
-            response = db.table("timetables").select("*").eq("class_id", class_id).execute()
+        # Final timetable if there is one, otherwise the newest draft
+        response = await asyncio.to_thread(db.rpc("get_class_timetable", {"p_class_id": class_id}).execute)
         
         if not response.data:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No timetable found for this class")
@@ -92,18 +113,12 @@ async def get_teacher_timetables(
     try:
         db = get_request_scoped_client(
             current_user.get("access_token"),
-            current_user.get("role") in ["admin", "principal"]
+            current_user.get("role") in _PRIVILEGED_ROLES
         )
         
-        # Get timetable IDs from entries
-        entries_response = db.table("timetable_entries").select("timetable_id").eq("teacher_id", teacher_id).execute()
-        timetable_ids = list(set([e["timetable_id"] for e in entries_response.data]))
-        
-        if not timetable_ids:
-            return []
-        
-        response = db.table("timetables").select("*").in_("id", timetable_ids).execute()
-        return [TimetableResponse(**item) for item in response.data]
+        # Inner join on timetable_entries; each timetable is returned once
+        response = await asyncio.to_thread(db.table("timetables").select(TEACHER_TIMETABLES_SELECT).eq("timetable_entries.teacher_id", teacher_id).execute)
+        return _TIMETABLE_LIST.validate_python(response.data)
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
@@ -117,10 +132,10 @@ async def get_timetable(
     try:
         db = get_request_scoped_client(
             current_user.get("access_token"),
-            current_user.get("role") in ["admin", "principal"]
+            current_user.get("role") in _PRIVILEGED_ROLES
         )
         
-        response = db.table("timetables").select("*").eq("id", timetable_id).execute()
+        response = await asyncio.to_thread(db.table("timetables").select("*").eq("id", timetable_id).execute)
         
         if not response.data:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Timetable not found")
@@ -135,7 +150,7 @@ async def get_timetable(
 @router.post("", response_model=TimetableResponse, status_code=status.HTTP_201_CREATED)
 async def create_timetable(
     timetable_data: TimetableCreate,
-    current_user: dict = Depends(require_role(["admin", "principal"]))
+    current_user: dict = Depends(_admin_principal)
 ):
     """Create a new timetable (admin/principal only)"""
     try:
@@ -144,7 +159,7 @@ async def create_timetable(
         timetable_dict = timetable_data.model_dump()
         timetable_dict["created_by"] = current_user.get("sub")
         
-        response = db.table("timetables").insert(timetable_dict).execute()
+        response = await asyncio.to_thread(db.table("timetables").insert(timetable_dict).execute)
         
         if not response.data:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Failed to create timetable")
@@ -160,7 +175,7 @@ async def create_timetable(
 async def update_timetable(
     timetable_id: str,
     timetable_data: TimetableUpdate,
-    current_user: dict = Depends(require_role(["admin", "principal"]))
+    current_user: dict = Depends(_admin_principal)
 ):
     """Update a timetable (admin/principal only)"""
     try:
@@ -168,7 +183,7 @@ async def update_timetable(
         
         update_dict = timetable_data.model_dump(exclude_unset=True)
         
-        response = db.table("timetables").update(update_dict).eq("id", timetable_id).execute()
+        response = await asyncio.to_thread(db.table("timetables").update(update_dict).eq("id", timetable_id).execute)
         
         if not response.data:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Timetable not found")
@@ -183,17 +198,14 @@ async def update_timetable(
 @router.delete("/{timetable_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_timetable(
     timetable_id: str,
-    current_user: dict = Depends(require_role(["admin", "principal"]))
+    current_user: dict = Depends(_admin_principal)
 ):
     """Delete a timetable and all its entries (admin/principal only)"""
     try:
         db = get_request_scoped_client(current_user.get("access_token"), True)
         
-        # Delete entries first (CASCADE should handle this, but being explicit)
-        db.table("timetable_entries").delete().eq("timetable_id", timetable_id).execute()
-        
-        # Delete timetable
-        db.table("timetables").delete().eq("id", timetable_id).execute()
+        # Entries are removed by ON DELETE CASCADE (see performance_schema.sql)
+        await asyncio.to_thread(db.table("timetables").delete().eq("id", timetable_id).execute)
         
         return None
     except Exception as e:
@@ -212,18 +224,18 @@ async def get_timetable_entries(
     try:
         db = get_request_scoped_client(
             current_user.get("access_token"),
-            current_user.get("role") in ["admin", "principal"]
+            current_user.get("role") in _PRIVILEGED_ROLES
         )
         
-        query = db.table("timetable_entries").select("*").eq("timetable_id", timetable_id)
+        query = db.table("timetable_entries").select(_TIMETABLE_ENTRY_COLUMNS).eq("timetable_id", timetable_id)
         
         if day_of_week:
             query = query.eq("day_of_week", day_of_week)
         
         query = query.order("day_of_week").order("period_number")
         
-        response = query.execute()
-        return [TimetableEntryResponse(**item) for item in response.data]
+        response = await asyncio.to_thread(query.execute)
+        return _TIMETABLE_ENTRY_LIST.validate_python(response.data)
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
@@ -232,7 +244,7 @@ async def get_timetable_entries(
 async def create_timetable_entry(
     timetable_id: str,
     entry_data: TimetableEntryCreate,
-    current_user: dict = Depends(require_role(["admin", "principal"]))
+    current_user: dict = Depends(_admin_principal)
 ):
     """Create a new timetable entry (admin/principal only)"""
     try:
@@ -241,7 +253,7 @@ async def create_timetable_entry(
         entry_dict = entry_data.model_dump()
         entry_dict["timetable_id"] = timetable_id
         
-        response = db.table("timetable_entries").insert(entry_dict).execute()
+        response = await asyncio.to_thread(db.table("timetable_entries").insert(entry_dict).execute)
         
         if not response.data:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Failed to create timetable entry")
@@ -257,7 +269,7 @@ async def create_timetable_entry(
 async def update_timetable_entry(
     entry_id: str,
     entry_data: TimetableEntryUpdate,
-    current_user: dict = Depends(require_role(["admin", "principal"]))
+    current_user: dict = Depends(_admin_principal)
 ):
     """Update a timetable entry (admin/principal only)"""
     try:
@@ -265,7 +277,7 @@ async def update_timetable_entry(
         
         update_dict = entry_data.model_dump(exclude_unset=True)
         
-        response = db.table("timetable_entries").update(update_dict).eq("id", entry_id).execute()
+        response = await asyncio.to_thread(db.table("timetable_entries").update(update_dict).eq("id", entry_id).execute)
         
         if not response.data:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Timetable entry not found")
@@ -280,13 +292,13 @@ async def update_timetable_entry(
 @router.delete("/entries/{entry_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_timetable_entry(
     entry_id: str,
-    current_user: dict = Depends(require_role(["admin", "principal"]))
+    current_user: dict = Depends(_admin_principal)
 ):
     """Delete a timetable entry (admin/principal only)"""
     try:
         db = get_request_scoped_client(current_user.get("access_token"), True)
         
-        db.table("timetable_entries").delete().eq("id", entry_id).execute()
+        await asyncio.to_thread(db.table("timetable_entries").delete().eq("id", entry_id).execute)
         
         return None
     except Exception as e:
@@ -1,16 +1,70 @@
-from fastapi import APIRouter, HTTPException, status, Depends, Query
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Response
 from typing import Optional
+import asyncio
+from pydantic import TypeAdapter, ValidationError
+from postgrest.exceptions import APIError
+from supabase_auth.errors import AuthApiError
 from app.models.user import UserResponse, UserUpdate
 from app.core.supabase import supabase, supabase_admin
 from app.core.security import get_current_user, require_role
+from app.core.supabase_helpers import _SUPABASE_ERRORS
 from app.core.logging_config import get_logger
-from app.core.exceptions import DatabaseError, NotFoundError, sanitize_error_message
+from app.core.exceptions import (
+    SchoolManagementException,
+    ConflictError,
+    DatabaseError,
+    NotFoundError,
+    sanitize_error_message,
+)
+from app.core.cache import (
+    get_auth_user_cached,
+    invalidate_auth_user,
+    invalidate_user,
+    user_cache,
+    user_list_cache,
+)
+from app.core.response_helpers import validated_json_response
 
 logger = get_logger(__name__)
 router = APIRouter()
 
+_USER_LIST = TypeAdapter(list[UserResponse])
+# Exactly the fields UserResponse projects
+_USER_COLUMNS = "id,email,full_name,role,phone,address,avatar_url,created_at"
 
-@router.get("", response_model=list[UserResponse])
+
+def _supabase_error(error: Exception, action: str, error_code: str) -> SchoolManagementException:
+    """
+    Map a Supabase client error to an application exception.
+
+    These errors carry a code/status, so they are classified directly instead
+    of going through sanitize_error_message. Their raw text can name tables
+    and constraints, so it is only logged, never returned (GoTrue messages
+    are meant for end users and are kept).
+    """
+    if isinstance(error, APIError):
+        if error.code == "23505":
+            return ConflictError(f"Failed to {action}: duplicate value", error_code="DUPLICATE_ENTRY")
+        # 22P02: malformed uuid, i.e. no such user
+        if error.code == "22P02":
+            return NotFoundError("User not found", error_code="USER_NOT_FOUND")
+        return DatabaseError(f"Failed to {action}", error_code=error_code)
+    if isinstance(error, AuthApiError):
+        if error.status == 404:
+            return NotFoundError("User not found", error_code="USER_NOT_FOUND")
+        return DatabaseError(f"Failed to {action}: {error.message}", error_code=error_code)
+    # httpx.HTTPError: Supabase unreachable or timed out
+    return DatabaseError(
+        f"Failed to {action}: service unavailable, please try again later",
+        error_code="SERVICE_UNAVAILABLE"
+    )
+
+
+@router.get(
+    "",
+    response_model=None,
+    responses={200: {"model": list[UserResponse]}}
+)
 async def list_users(
     role: Optional[str] = Query(None),
     search: Optional[str] = Query(None),
@@ -19,49 +73,56 @@ async def list_users(
     current_user: dict = Depends(require_role(["admin", "principal"]))
 ):
     """List all users with optional filters"""
+    cache_key = (role, search, limit, offset)
+    cached = user_list_cache.get(cache_key)
+    if cached is not None:
+        return Response(content=cached, media_type="application/json")
+    
     try:
-        # Admin endpoints always use service role to bypass RLS
-        query = supabase_admin.table("profiles").select("*, user_id")
+        # Admin endpoints always use service role to bypass RLS.
+        # The view joins profiles with auth.users (email, role), so role is
+        # filtered in the database and no per-user auth lookup is needed.
+        query = supabase_admin.table("user_profiles_with_role").select(_USER_COLUMNS)
+        
+        if role:
+            query = query.eq("role", role)
         
         if search:
             query = query.ilike("full_name", f"%{search}%")
         
         query = query.range(offset, offset + limit - 1)
-        response = query.execute()
+        response = await asyncio.to_thread(query.execute)
+        
+        # Rows already have UserResponse's shape: validate + serialize in one pass
+        try:
+            result = validated_json_response(_USER_LIST, response.data)
+        except ValidationError:
+            result = None
+        
+        if result is not None:
+            user_list_cache[cache_key] = result.body
+            return result
         
+        # Slow path: skip users with missing or invalid data
+        validate_user = UserResponse.model_validate
+        warn = logger.warning
         users = []
-        for profile in response.data:
-            # Get user auth data
+        for row in response.data:
             try:
-                user_data = supabase_admin.auth.admin.get_user_by_id(profile["user_id"])
-                user_role = user_data.user.user_metadata.get("role", "student")
-                
-                if role and user_role != role:
-                    continue
-                
-                users.append(UserResponse(
-                    id=profile["user_id"],
-                    email=user_data.user.email,
-                    full_name=profile.get("full_name", ""),
-                    role=user_role,
-                    phone=profile.get("phone"),
-                    address=profile.get("address"),
-                    avatar_url=profile.get("avatar_url"),
-                    created_at=profile.get("created_at")
-                ))
-            except (KeyError, AttributeError, TypeError) as e:
-                # Skip users with missing or invalid data
-                logger.warning(f"Skipping user {profile.get('user_id', 'unknown')}: {str(e)}")
-                continue
-            except Exception as e:
-                # Log unexpected errors but continue processing other users
-                logger.error(f"Error fetching user {profile.get('user_id', 'unknown')}: {str(e)}")
+                users.append(validate_user(row))
+            except ValidationError as e:
+                warn(f"Skipping user {row.get('id', 'unknown')}: {str(e)}")
                 continue
         
-        return users
+        result = validated_json_response(_USER_LIST, users)
+        user_list_cache[cache_key] = result.body
+        return result
         
     except HTTPException:
         raise
+    except _SUPABASE_ERRORS as e:
+        logger.error(f"Failed to fetch users: {str(e)}")
+        raise _supabase_error(e, "fetch users", "FETCH_ERROR")
     except Exception as e:
         logger.error(f"Failed to fetch users: {str(e)}")
         error_message = sanitize_error_message(e)
@@ -71,6 +132,25 @@ async def list_users(
         )
 
 
+async def _fetch_user(user_id: str) -> UserResponse:
+    """Profile + auth fields (email, role) in one query, cached per user_id."""
+    cached = user_cache.get(user_id)
+    if cached is not None:
+        return cached
+    
+    user_response = await asyncio.to_thread(
+        supabase_admin.table("user_profiles_with_role").select(_USER_COLUMNS).eq("id", user_id).maybe_single().execute
+    )
+    user = user_response.data if user_response else None
+    
+    if not user:
+        raise NotFoundError(f"User with ID {user_id} not found", error_code="USER_NOT_FOUND")
+    
+    user_model = UserResponse(**user)
+    user_cache[user_id] = user_model
+    return user_model
+
+
 @router.get("/{user_id}", response_model=UserResponse)
 async def get_user(
     user_id: str,
@@ -78,26 +158,7 @@ async def get_user(
 ):
     """Get user by ID"""
     try:
-        # Get profile
-        profile_response = supabase.table("profiles").select("*").eq("user_id", user_id).single().execute()
-        profile = profile_response.data
-        
-        if not profile:
-            raise NotFoundError(f"User with ID {user_id} not found", error_code="USER_NOT_FOUND")
-        
-        # Get auth data
-        user_data = supabase_admin.auth.admin.get_user_by_id(user_id)
-        
-        return UserResponse(
-            id=user_id,
-            email=user_data.user.email,
-            full_name=profile.get("full_name", ""),
-            role=user_data.user.user_metadata.get("role", "student"),
-            phone=profile.get("phone"),
-            address=profile.get("address"),
-            avatar_url=profile.get("avatar_url"),
-            created_at=profile.get("created_at")
-        )
+        return await _fetch_user(user_id)
         
     except NotFoundError:
         raise
@@ -106,6 +167,9 @@ async def get_user(
     except (KeyError, AttributeError) as e:
         logger.error(f"Data structure error fetching user {user_id}: {str(e)}")
         raise DatabaseError(f"Invalid user data structure", error_code="INVALID_DATA")
+    except _SUPABASE_ERRORS as e:
+        logger.error(f"Failed to fetch user {user_id}: {str(e)}")
+        raise _supabase_error(e, "fetch user", "FETCH_ERROR")
     except Exception as e:
         logger.error(f"Failed to fetch user {user_id}: {str(e)}")
         error_message = sanitize_error_message(e)
@@ -129,27 +193,30 @@ async def update_user(
         )
     
     try:
-        # Update profile
         update_data = user_data.model_dump(exclude_unset=True)
         
-        if update_data:
-            supabase.table("profiles").update(update_data).eq("user_id", user_id).execute()
+        # Nothing to update: return the current user without issuing an UPDATE
+        if not update_data:
+            return await _fetch_user(user_id)
         
-        # Get updated profile
-        profile_response = supabase.table("profiles").select("*").eq("user_id", user_id).single().execute()
-        profile = profile_response.data
+        # Update profile; the UPDATE returns the updated row (return=representation)
+        profile_response = await asyncio.to_thread(
+            supabase.table("profiles").update(update_data).eq("user_id", user_id).execute
+        )
         
-        if not profile:
+        if not profile_response.data:
             raise NotFoundError(f"User with ID {user_id} not found", error_code="USER_NOT_FOUND")
         
-        # Get auth data
-        user_auth = supabase_admin.auth.admin.get_user_by_id(user_id)
+        invalidate_user(user_id)
+        
+        profile = profile_response.data[0]
+        auth_user = await get_auth_user_cached(user_id)
         
         return UserResponse(
             id=user_id,
-            email=user_auth.user.email,
+            email=auth_user["email"],
             full_name=profile.get("full_name", ""),
-            role=user_auth.user.user_metadata.get("role", "student"),
+            role=auth_user["role"],
             phone=profile.get("phone"),
             address=profile.get("address"),
             avatar_url=profile.get("avatar_url"),
@@ -161,13 +228,16 @@ async def update_user(
     except (KeyError, AttributeError) as e:
         logger.error(f"Data structure error updating user {user_id}: {str(e)}")
         raise DatabaseError(f"Invalid user data structure", error_code="INVALID_DATA")
+    except _SUPABASE_ERRORS as e:
+        logger.error(f"Failed to update user {user_id}: {str(e)}")
+        raise _supabase_error(e, "update user", "UPDATE_ERROR")
     except Exception as e:
         logger.error(f"Failed to update user {user_id}: {str(e)}")
         error_message = sanitize_error_message(e)
         raise DatabaseError(f"Failed to update user: {error_message}", error_code="UPDATE_ERROR")
 
 
-@router.delete("/{user_id}")
+@router.delete("/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_user(
     user_id: str,
     current_user: dict = Depends(require_role(["admin"]))
@@ -175,11 +245,16 @@ async def delete_user(
     """Deactivate user (soft delete)"""
     try:
         # Delete user from Supabase Auth
-        supabase_admin.auth.admin.delete_user(user_id)
+        await asyncio.to_thread(supabase_admin.auth.admin.delete_user, user_id)
+        invalidate_auth_user(user_id)
+        invalidate_user(user_id)
         
         logger.info(f"User {user_id} deleted by admin {current_user.get('sub')}")
-        return {"message": "User deleted successfully"}
+        return Response(status_code=status.HTTP_204_NO_CONTENT)
         
+    except _SUPABASE_ERRORS as e:
+        logger.error(f"Failed to delete user {user_id}: {str(e)}")
+        raise _supabase_error(e, "delete user", "DELETE_ERROR")
     except Exception as e:
         logger.error(f"Failed to delete user {user_id}: {str(e)}")
         error_message = sanitize_error_message(e)
@@ -0,0 +1,131 @@
+"""Short-lived in-process caches for frequently polled read endpoints."""
+import asyncio
+from threading import Lock
+from typing import Any, Dict, Optional
+from cachetools import TTLCache
+from app.core.supabase import supabase_admin
+
+# Dashboards re-poll the /me endpoints; a short TTL absorbs the bursts
+ME_CACHE_TTL_SECONDS = 15
+ME_CACHE_CONTROL = f"private, max-age={ME_CACHE_TTL_SECONDS}"
+
+# Keyed by auth user_id
+teacher_profile_cache: TTLCache = TTLCache(maxsize=10_000, ttl=ME_CACHE_TTL_SECONDS)
+teacher_classes_cache: TTLCache = TTLCache(maxsize=10_000, ttl=ME_CACHE_TTL_SECONDS)
+
+
+def invalidate_teacher_profile(user_id: Optional[str]) -> None:
+    """Drop a teacher's cached /me/profile response after it changes."""
+    if user_id:
+        teacher_profile_cache.pop(user_id, None)
+
+
+def invalidate_teacher_classes() -> None:
+    """
+    Drop all cached /me/classes responses.
+
+    Class mutations only know the teacher's id, not their user_id, and happen
+    rarely enough that clearing everything is cheaper than looking it up.
+    """
+    teacher_classes_cache.clear()
+
+
+# Auth user fields (email, role) change rarely; cache GoTrue lookups per user_id
+AUTH_CACHE_TTL_SECONDS = 300
+auth_user_cache: TTLCache = TTLCache(maxsize=10_000, ttl=AUTH_CACHE_TTL_SECONDS)
+# TTLCache isn't thread-safe and helpers use it from worker threads: every
+# read and write goes through this lock
+auth_user_cache_lock = Lock()
+
+
+def cache_auth_user(user: Any) -> Dict[str, Any]:
+    """Store a GoTrue user's email and role in auth_user_cache and return them."""
+    auth_user = {
+        "email": user.email,
+        "role": (user.user_metadata or {}).get("role", "student"),
+    }
+    with auth_user_cache_lock:
+        auth_user_cache[user.id] = auth_user
+    return auth_user
+
+
+async def get_auth_user_cached(user_id: str) -> Dict[str, Any]:
+    """
+    Get an auth user's email and role, from cache when possible.
+
+    Returns:
+        Dict with "email" and "role" (defaults to "student")
+    """
+    with auth_user_cache_lock:
+        cached = auth_user_cache.get(user_id)
+    if cached is not None:
+        return cached
+    
+    user_data = await asyncio.to_thread(supabase_admin.auth.admin.get_user_by_id, user_id)
+    return cache_auth_user(user_data.user)
+
+
+def invalidate_auth_user(user_id: Optional[str]) -> None:
+    """Drop a user's cached auth fields after the auth user changes or is deleted."""
+    if user_id:
+        with auth_user_cache_lock:
+            auth_user_cache.pop(user_id, None)
+
+
+# GET /users and GET /users/{id}: admin-scoped profile data read with the
+# service role, so entries are keyed by query only, never by caller
+USER_LIST_CACHE_TTL_SECONDS = 30
+USER_CACHE_TTL_SECONDS = 60
+
+# (role, search, limit, offset) -> serialized JSON body
+user_list_cache: TTLCache = TTLCache(maxsize=1_000, ttl=USER_LIST_CACHE_TTL_SECONDS)
+# user_id -> UserResponse
+user_cache: TTLCache = TTLCache(maxsize=10_000, ttl=USER_CACHE_TTL_SECONDS)
+
+
+# Profile rows attached to student/teacher responses, read with the service
+# role (so not subject to per-caller RLS), keyed by user_id
+PROFILE_CACHE_TTL_SECONDS = 60
+profile_cache: TTLCache = TTLCache(maxsize=10_000, ttl=PROFILE_CACHE_TTL_SECONDS)
+# TTLCache isn't thread-safe and helpers use it from worker threads: every
+# read and write goes through this lock
+profile_cache_lock = Lock()
+
+
+def invalidate_user(user_id: Optional[str] = None) -> None:
+    """
+    Drop cached user responses after a profile or auth user changes.
+
+    Any write can move a user in or out of a filtered page, so every cached
+    list is cleared; only the affected single-user entries are dropped.
+    """
+    if user_id:
+        user_cache.pop(user_id, None)
+        with profile_cache_lock:
+            profile_cache.pop(user_id, None)
+    user_list_cache.clear()
+
+
+# Financial report aggregates, keyed by (cache scope, start date, end date).
+# A period that includes today keeps changing, so it expires quickly; closed
+# periods only change through backdated entries, which invalidate explicitly.
+# Caches are per worker process and invalidation only reaches the worker that
+# handled the write, so other workers may serve closed periods (and the first
+# activity date) up to CLOSED_REPORT_CACHE_TTL_SECONDS stale.
+OPEN_REPORT_CACHE_TTL_SECONDS = 60
+CLOSED_REPORT_CACHE_TTL_SECONDS = 300
+open_report_cache: TTLCache = TTLCache(maxsize=256, ttl=OPEN_REPORT_CACHE_TTL_SECONDS)
+closed_report_cache: TTLCache = TTLCache(maxsize=1_000, ttl=CLOSED_REPORT_CACHE_TTL_SECONDS)
+# Earliest financial activity date, keyed by cache scope
+first_activity_cache: TTLCache = TTLCache(maxsize=256, ttl=CLOSED_REPORT_CACHE_TTL_SECONDS)
+
+
+def invalidate_financial_reports() -> None:
+    """
+    Drop all cached report aggregates after donations, expenses, salaries or distributions change.
+    
+    Only clears this worker's caches; other workers catch up within the TTLs.
+    """
+    open_report_cache.clear()
+    closed_report_cache.clear()
+    first_activity_cache.clear()
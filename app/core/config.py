@@ -1,8 +1,21 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pydantic import field_validator, Field
+from functools import lru_cache
 from typing import List
 import re
-from urllib.parse import urlparse
+
+# scheme://netloc[...]
+_URL_RE = re.compile(r"^([A-Za-z][A-Za-z0-9+.\-]*)://([^/?#]+)")
+
+
+def _validate_url(v: str, field_name: str, example: str = "", http_only: bool = False) -> str:
+    """Check that v looks like scheme://host, optionally restricted to http(s)."""
+    match = _URL_RE.match(v)
+    if not match:
+        raise ValueError(f"Invalid {field_name} format: {field_name} must be a valid URL{example}")
+    if http_only and match.group(1).lower() not in ("http", "https"):
+        raise ValueError(f"Invalid {field_name} format: {field_name} must use http or https protocol")
+    return v
 
 
 class Settings(BaseSettings):
@@ -25,6 +38,17 @@ class Settings(BaseSettings):
     # CORS
     FRONTEND_URL: str = "http://localhost:3000"
     
+    # Rate limiting (in-memory, so each worker process enforces these separately)
+    RATE_LIMIT_PER_MINUTE: int = Field(default=60, ge=1, description="Requests per minute per client IP, per worker")
+    RATE_LIMIT_PER_HOUR: int = Field(default=1000, ge=1, description="Requests per hour per client IP, per worker")
+    RATE_LIMIT_BURST: int = Field(default=10, ge=1, description="Requests per second per client IP, per worker")
+    
+    # Metrics (/metrics is only served when this is set, to requests sending it as a bearer token)
+    METRICS_TOKEN: str = Field(default="", description="Bearer token Prometheus must send to scrape /metrics")
+    
+    # Logging
+    ENABLE_FILE_LOGS: bool = Field(default=True, description="Also write logs/app.log and logs/errors.log (disable on read-only/serverless hosts)")
+    
     # Server
     PORT: int = Field(default=8000, description="Server port (Railway sets this automatically)")
     
@@ -40,15 +64,7 @@ class Settings(BaseSettings):
         """Validate Supabase URL format."""
         if not v:
             raise ValueError("SUPABASE_URL is required")
-        try:
-            parsed = urlparse(v)
-            if not parsed.scheme or not parsed.netloc:
-                raise ValueError("SUPABASE_URL must be a valid URL (e.g., https://xxxxx.supabase.co)")
-            if parsed.scheme not in ['http', 'https']:
-                raise ValueError("SUPABASE_URL must use http or https protocol")
-        except Exception as e:
-            raise ValueError(f"Invalid SUPABASE_URL format: {e}")
-        return v
+        return _validate_url(v, "SUPABASE_URL", " (e.g., https://xxxxx.supabase.co)", http_only=True)
     
     @field_validator('SUPABASE_KEY')
     @classmethod
@@ -82,23 +98,24 @@ class Settings(BaseSettings):
     def validate_frontend_url(cls, v: str) -> str:
         """Validate frontend URL format."""
         if v:
-            try:
-                parsed = urlparse(v)
-                if not parsed.scheme or not parsed.netloc:
-                    raise ValueError("FRONTEND_URL must be a valid URL")
-            except Exception as e:
-                raise ValueError(f"Invalid FRONTEND_URL format: {e}")
+            _validate_url(v, "FRONTEND_URL")
         return v
 
 
+@lru_cache
+def get_settings() -> Settings:
+    """Build settings once (parses .env and runs validators); cached afterwards."""
+    return Settings()
+
+
 def validate_settings() -> None:
     """Validate all required settings are present and valid."""
     from app.core.exceptions import ConfigurationError
     
     try:
-        # Re-initialize settings to ensure validation
+        # Reuses the instance built at import; builds (and raises) if that failed
         global settings
-        settings = Settings()
+        settings = get_settings()
         
         # Additional validations
         if not settings.SUPABASE_URL.startswith('https://') and not settings.DEBUG:
@@ -131,7 +148,7 @@ def validate_settings() -> None:
 
 # Initialize settings and validate
 try:
-    settings = Settings()
+    settings = get_settings()
 except Exception as e:
     # Settings will be validated in main.py startup
     settings = None
@@ -1,10 +1,14 @@
 """Custom exception classes for the School Management System."""
+import re
+from functools import lru_cache
 from typing import Optional, Dict, Any
 
 
 class SchoolManagementException(Exception):
     """Base exception for all application-specific exceptions."""
     
+    __slots__ = ("message", "error_code", "details")
+    
     def __init__(
         self,
         message: str,
@@ -19,37 +23,59 @@ class SchoolManagementException(Exception):
 
 class DatabaseError(SchoolManagementException):
     """Exception raised for database-related errors."""
-    pass
+    __slots__ = ()
 
 
 class ValidationError(SchoolManagementException):
     """Exception raised for validation errors."""
-    pass
+    __slots__ = ()
 
 
 class AuthenticationError(SchoolManagementException):
     """Exception raised for authentication errors."""
-    pass
+    __slots__ = ()
 
 
 class AuthorizationError(SchoolManagementException):
     """Exception raised for authorization errors."""
-    pass
+    __slots__ = ()
 
 
 class NotFoundError(SchoolManagementException):
     """Exception raised when a resource is not found."""
-    pass
+    __slots__ = ()
 
 
 class ConflictError(SchoolManagementException):
     """Exception raised for resource conflicts (e.g., duplicate entries)."""
-    pass
+    __slots__ = ()
 
 
 class ConfigurationError(SchoolManagementException):
     """Exception raised for configuration errors."""
-    pass
+    __slots__ = ()
+
+
+# Potentially sensitive patterns (case-insensitive, substring match)
+_SENSITIVE_RE = re.compile(
+    r"password|secret|key|token|credential|auth|connection|database|sql|query",
+    re.IGNORECASE
+)
+
+# Generic production messages, checked in priority order
+_SENSITIVE_MESSAGES = (
+    (frozenset({"password", "credential"}), "Authentication failed. Please check your credentials."),
+    (frozenset({"connection", "database"}), "Database connection error. Please try again later."),
+    (frozenset({"token", "auth"}), "Authentication error. Please login again."),
+)
+
+
+@lru_cache(maxsize=1)
+def _debug() -> bool:
+    """Read settings.DEBUG once (settings are fixed after startup validation)."""
+    # Imported lazily: config imports this module during validate_settings
+    from app.core.config import get_settings
+    return bool(get_settings().DEBUG)
 
 
 def sanitize_error_message(error: Exception, include_details: bool = False) -> str:
@@ -63,48 +89,27 @@ def sanitize_error_message(error: Exception, include_details: bool = False) -> s
     Returns:
         Sanitized error message
     """
-    from app.core.config import settings
-    
     # If it's our custom exception, use its message
     if isinstance(error, SchoolManagementException):
         return error.message
     
-    # For known exception types, provide user-friendly messages
-    error_type = type(error).__name__
+    debug = _debug()
     error_str = str(error)
     
-    # List of potentially sensitive patterns (case-insensitive)
-    sensitive_patterns = [
-        'password',
-        'secret',
-        'key',
-        'token',
-        'credential',
-        'auth',
-        'connection',
-        'database',
-        'sql',
-        'query',
-    ]
-    
-    # Check if error message contains sensitive information
-    error_lower = error_str.lower()
-    is_sensitive = any(pattern in error_lower for pattern in sensitive_patterns)
-    
-    if is_sensitive and not settings.DEBUG:
-        # In production, return generic message for sensitive errors
-        if 'password' in error_lower or 'credential' in error_lower:
-            return "Authentication failed. Please check your credentials."
-        elif 'connection' in error_lower or 'database' in error_lower:
-            return "Database connection error. Please try again later."
-        elif 'token' in error_lower or 'auth' in error_lower:
-            return "Authentication error. Please login again."
-        else:
+    if not debug:
+        # Check if error message contains sensitive information (single pass)
+        matches = {match.lower() for match in _SENSITIVE_RE.findall(error_str)}
+        
+        if matches:
+            # In production, return generic message for sensitive errors
+            for patterns, message in _SENSITIVE_MESSAGES:
+                if matches & patterns:
+                    return message
             return "An error occurred. Please try again or contact support."
     
     # In debug mode or for non-sensitive errors, return the actual message
-    if settings.DEBUG or include_details:
-        return f"{error_type}: {error_str}"
+    if debug or include_details:
+        return f"{type(error).__name__}: {error_str}"
     else:
         return "An error occurred. Please try again."
 
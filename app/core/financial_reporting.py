@@ -1,23 +1,91 @@
 """Financial Reporting Utilities"""
-from typing import Dict, List, Optional
+import asyncio
+import math
+from collections import defaultdict
+from typing import Dict, List, Optional, Set
 from datetime import date, datetime, timedelta
 from calendar import monthrange
+from functools import lru_cache
 from app.core.logging_config import get_logger
+from app.core.cache import open_report_cache, closed_report_cache, first_activity_cache
 
 logger = get_logger(__name__)
 
+# Totals of a period with no records; stands in for a previous period that
+# ends before the first financial activity
+_EMPTY_PERIOD = {"total_income": 0.0, "total_expenses": 0.0, "net_profit_loss": 0.0}
+
+
+@lru_cache(maxsize=128)
+def _date_range(report_type: str, today: date, date_from: Optional[str], date_to: Optional[str]) -> tuple[date, date]:
+    """Date range for a report type as of `today` (memoized; invalid input raises and isn't cached)."""
+    if report_type == "daily":
+        return today, today
+    
+    elif report_type == "weekly":
+        # Start of week (Monday)
+        days_since_monday = today.weekday()
+        start_date = today - timedelta(days=days_since_monday)
+        return start_date, today
+    
+    elif report_type == "monthly":
+        # Current month
+        start_date = date(today.year, today.month, 1)
+        _, last_day = monthrange(today.year, today.month)
+        end_date = date(today.year, today.month, last_day)
+        return start_date, end_date
+    
+    elif report_type == "6-month":
+        # Last 6 months
+        end_date = today
+        # Go back 6 months
+        if today.month > 6:
+            start_date = date(today.year, today.month - 5, 1)
+        else:
+            start_date = date(today.year - 1, today.month + 7, 1)
+        return start_date, end_date
+    
+    elif report_type == "yearly":
+        # Current year
+        start_date = date(today.year, 1, 1)
+        end_date = date(today.year, 12, 31)
+        return start_date, end_date
+    
+    elif report_type == "custom":
+        if not date_from or not date_to:
+            raise ValueError("date_from and date_to are required for custom reports")
+        return date.fromisoformat(date_from), date.fromisoformat(date_to)
+    
+    else:
+        raise ValueError(f"Invalid report type: {report_type}")
+
+
+@lru_cache(maxsize=128)
+def _previous_period(current_start: date, current_end: date) -> tuple[date, date]:
+    """Period of the same length ending the day before current_start (memoized)."""
+    period_days = (current_end - current_start).days + 1
+    
+    prev_end = current_start - timedelta(days=1)
+    prev_start = prev_end - timedelta(days=period_days - 1)
+    
+    return prev_start, prev_end
+
 
 class FinancialReportGenerator:
     """Generate financial reports for different periods"""
     
-    def __init__(self, db_client):
+    def __init__(self, db_client, cache_scope: Optional[str] = None):
         """
         Initialize report generator with database client
         
         Args:
             db_client: Supabase client instance
+            cache_scope: Key under which aggregates may be cached (e.g. the
+                caller's user id, since RLS decides which rows they see);
+                None disables caching
         """
         self.db = db_client
+        self.cache_scope = cache_scope
     
     def get_date_range(self, report_type: str, date_from: Optional[str] = None, date_to: Optional[str] = None) -> tuple[date, date]:
         """
@@ -31,60 +99,41 @@ class FinancialReportGenerator:
         Returns:
             Tuple of (start_date, end_date)
         """
-        today = date.today()
-        
-        if report_type == "daily":
-            return today, today
-        
-        elif report_type == "weekly":
-            # Start of week (Monday)
-            days_since_monday = today.weekday()
-            start_date = today - timedelta(days=days_since_monday)
-            return start_date, today
-        
-        elif report_type == "monthly":
-            # Current month
-            start_date = date(today.year, today.month, 1)
-            _, last_day = monthrange(today.year, today.month)
-            end_date = date(today.year, today.month, last_day)
-            return start_date, end_date
-        
-        elif report_type == "6-month":
-            # Last 6 months
-            end_date = today
-            # Go back 6 months
-            if today.month > 6:
-                start_date = date(today.year, today.month - 5, 1)
-            else:
-                start_date = date(today.year - 1, today.month + 7, 1)
-            return start_date, end_date
-        
-        elif report_type == "yearly":
-            # Current year
-            start_date = date(today.year, 1, 1)
-            end_date = date(today.year, 12, 31)
-            return start_date, end_date
-        
-        elif report_type == "custom":
-            if not date_from or not date_to:
-                raise ValueError("date_from and date_to are required for custom reports")
-            return date.fromisoformat(date_from), date.fromisoformat(date_to)
-        
-        else:
-            raise ValueError(f"Invalid report type: {report_type}")
+        return _date_range(report_type, date.today(), date_from, date_to)
     
     def get_previous_period(self, report_type: str, current_start: date, current_end: date) -> tuple[date, date]:
         """Get previous period for comparison"""
-        period_days = (current_end - current_start).days + 1
+        return _previous_period(current_start, current_end)
+    
+    def _get_teacher_names(self, teacher_ids: Set[str]) -> Dict[str, str]:
+        """
+        Map teacher id -> full name in two batched queries
+        
+        teachers and profiles are only linked through auth.users, so the
+        names can't be embedded in the teachers query.
+        """
+        if not teacher_ids:
+            return {}
+        
+        teachers_response = self.db.table("teachers")\
+            .select("id, user_id")\
+            .in_("id", list(teacher_ids))\
+            .execute()
+        user_ids = {t["id"]: t["user_id"] for t in (teachers_response.data or [])}
+        if not user_ids:
+            return {}
         
-        prev_end = current_start - timedelta(days=1)
-        prev_start = prev_end - timedelta(days=period_days - 1)
+        profiles_response = self.db.table("profiles")\
+            .select("user_id, full_name")\
+            .in_("user_id", list(set(user_ids.values())))\
+            .execute()
+        names = {p["user_id"]: p.get("full_name") or "Unknown" for p in (profiles_response.data or [])}
         
-        return prev_start, prev_end
+        return {teacher_id: names.get(user_id, "Unknown") for teacher_id, user_id in user_ids.items()}
     
-    def aggregate_financial_data(self, start_date: date, end_date: date) -> Dict:
+    async def aggregate_financial_data(self, start_date: date, end_date: date) -> Dict:
         """
-        Aggregate all financial data for a date range
+        Aggregate all financial data for a date range, cached per cache_scope
         
         Args:
             start_date: Start date
@@ -93,106 +142,121 @@ class FinancialReportGenerator:
         Returns:
             Dictionary with aggregated financial data
         """
-        start_str = start_date.isoformat()
-        end_str = end_date.isoformat()
-        
-        # Get donations (income)
-        donations_response = self.db.table("donations")\
-            .select("*")\
-            .gte("date", start_str)\
-            .lte("date", end_str)\
-            .execute()
+        if self.cache_scope is None:
+            return await self._aggregate_financial_data(start_date, end_date)
+        
+        cache = closed_report_cache if end_date < date.today() else open_report_cache
+        key = (self.cache_scope, start_date, end_date)
+        data = cache.get(key)
+        if data is None:
+            data = await self._aggregate_financial_data(start_date, end_date)
+            cache[key] = data
+        return data
+    
+    async def _first_activity_date(self) -> Optional[date]:
+        """
+        Earliest date with financial activity, cached per cache_scope
         
-        donations = donations_response.data or []
-        total_income = sum(float(d.get("amount", 0)) for d in donations)
-        income_breakdown = {}
-        for donation in donations:
-            purpose = donation.get("purpose", "General")
-            amount = float(donation.get("amount", 0))
-            income_breakdown[purpose] = income_breakdown.get(purpose, 0) + amount
-        
-        # Get expenses
-        expenses_response = self.db.table("expenses")\
-            .select("*")\
-            .gte("date", start_str)\
-            .lte("date", end_str)\
-            .execute()
+        Returns date.max when there is no activity at all, and None if the
+        lookup fails (callers then aggregate as usual).
+        """
+        if self.cache_scope is not None:
+            cached = first_activity_cache.get(self.cache_scope)
+            if cached is not None:
+                return cached
+        
+        try:
+            response = await asyncio.to_thread(self.db.rpc("first_activity_date", {}).execute)
+        except Exception as e:
+            logger.warning(f"Could not fetch first activity date: {e}")
+            return None
+        
+        first_date = date.fromisoformat(response.data) if response.data else date.max
+        if self.cache_scope is not None:
+            first_activity_cache[self.cache_scope] = first_date
+        return first_date
+    
+    async def _aggregate_financial_data(self, start_date: date, end_date: date) -> Dict:
+        """
+        Aggregate all financial data for a date range
         
-        expenses = expenses_response.data or []
-        total_expenses = sum(float(e.get("amount", 0)) for e in expenses)
-        expense_breakdown = {}
-        for expense in expenses:
-            category = expense.get("category", "Other")
-            amount = float(expense.get("amount", 0))
-            expense_breakdown[category] = expense_breakdown.get(category, 0) + amount
-        
-        # Get salaries from monthly_salary_calculations (paid salaries)
-        # Note: This gets calculated salaries, not necessarily paid
-        # We'll use salary_records table for actual paid salaries
-        salary_records_response = self.db.table("salary_records")\
-            .select("*")\
-            .gte("paid_date", start_str)\
-            .lte("paid_date", end_str)\
-            .execute()
+        Income, expense, paid-salary and stationery totals are summed by the
+        financial_summary database function; approved salary calculations
+        are fetched alongside it for the per-teacher breakdown.
         
-        salary_records = salary_records_response.data or []
-        total_salaries = sum(float(s.get("net_salary", 0)) for s in salary_records)
+        Args:
+            start_date: Start date
+            end_date: End date
+        
+        Returns:
+            Dictionary with aggregated financial data
+        """
+        # (year, month) pairs covered by the date range, from month indexes
+        first_month = start_date.year * 12 + start_date.month - 1
+        last_month = end_date.year * 12 + end_date.month - 1
+        months = {(i // 12, i % 12 + 1) for i in range(first_month, last_month + 1)}
+        month_numbers = {month for _, month in months}
+        
+        summary_query = self.db.rpc("financial_summary", {
+            "p_start": start_date.isoformat(),
+            "p_end": end_date.isoformat()
+        })
+        
+        # Approved salary calculations: one query for every year in range,
+        # narrowed to the exact (year, month) pairs in Python
+        calc_query = self.db.table("monthly_salary_calculations")\
+            .select("teacher_id, calculation_month, calculation_year, net_salary")\
+            .gte("calculation_year", start_date.year)\
+            .lte("calculation_year", end_date.year)\
+            .eq("is_approved", True)
+        if len(month_numbers) < 12:
+            calc_query = calc_query.in_("calculation_month", sorted(month_numbers))
+        
+        summary_response, calc_response = await asyncio.gather(
+            asyncio.to_thread(summary_query.execute),
+            asyncio.to_thread(calc_query.execute),
+        )
+        summary = summary_response.data or {}
+        
+        # Donations (income)
+        total_income = float(summary.get("total_income", 0))
+        income_breakdown = {k: float(v) for k, v in (summary.get("income_breakdown") or {}).items()}
+        
+        # Expenses
+        total_expenses = float(summary.get("total_expenses", 0))
+        expense_breakdown = {k: float(v) for k, v in (summary.get("expense_breakdown") or {}).items()}
+        
+        # Paid salaries from salary_records
+        total_salaries = float(summary.get("total_paid_salaries", 0))
         
         # Also get from monthly_salary_calculations for months in range
-        calc_salaries = 0
-        salary_breakdown = {}
-        
-        # Get calculations for months in the date range
-        current_date = start_date
-        while current_date <= end_date:
-            month = current_date.month
-            year = current_date.year
-            
-            calc_response = self.db.table("monthly_salary_calculations")\
-                .select("*")\
-                .eq("calculation_month", month)\
-                .eq("calculation_year", year)\
-                .eq("is_approved", True)\
-                .execute()
-            
-            for calc in (calc_response.data or []):
-                calc_salaries += float(calc.get("net_salary", 0))
-                # Get teacher name for breakdown
-                teacher_id = calc.get("teacher_id")
-                if teacher_id:
-                    teacher_response = self.db.table("teachers")\
-                        .select("user:full_name")\
-                        .eq("id", teacher_id)\
-                        .single()\
-                        .execute()
-                    teacher_name = "Unknown"
-                    if teacher_response.data:
-                        user = teacher_response.data.get("user")
-                        teacher_name = user.get("full_name", "Unknown") if user else "Unknown"
-                    
-                    salary_breakdown[teacher_name] = salary_breakdown.get(teacher_name, 0) + float(calc.get("net_salary", 0))
-            
-            # Move to next month
-            if month == 12:
-                current_date = date(year + 1, 1, 1)
-            else:
-                current_date = date(year, month + 1, 1)
+        calcs = [
+            calc for calc in (calc_response.data or [])
+            if (calc.get("calculation_year"), calc.get("calculation_month")) in months
+        ]
+        
+        teacher_names = await asyncio.to_thread(
+            self._get_teacher_names,
+            {c["teacher_id"] for c in calcs if c.get("teacher_id")}
+        )
+        net_salaries = []
+        salary_breakdown = defaultdict(float)
+        teacher_name = teacher_names.get
+        for calc in calcs:
+            net_salary = float(calc.get("net_salary", 0))
+            net_salaries.append(net_salary)
+            # Teacher name for breakdown
+            teacher_id = calc.get("teacher_id")
+            if teacher_id:
+                salary_breakdown[teacher_name(teacher_id, "Unknown")] += net_salary
+        calc_salaries = math.fsum(net_salaries)
         
         # Use calculated salaries if salary_records not available
         if total_salaries == 0:
             total_salaries = calc_salaries
         
-        # Get stationery costs (from distributions)
-        distributions_response = self.db.table("stationery_distributions")\
-            .select("*")\
-            .gte("distributed_date", start_str)\
-            .lte("distributed_date", end_str)\
-            .execute()
-        
-        distributions = distributions_response.data or []
-        # Calculate stationery costs (assuming average price per unit)
-        # In real implementation, you'd look up actual item prices
-        total_stationery = len(distributions) * 10  # Placeholder calculation
+        # Stationery costs: distributed quantity x item unit price
+        total_stationery = float(summary.get("total_stationery", 0))
         
         # Calculate net profit/loss
         net_profit_loss = total_income - total_expenses - total_salaries - total_stationery
@@ -205,13 +269,13 @@ class FinancialReportGenerator:
             "net_profit_loss": net_profit_loss,
             "income_breakdown": income_breakdown,
             "expense_breakdown": expense_breakdown,
-            "salary_breakdown": salary_breakdown,
-            "donations_count": len(donations),
-            "expenses_count": len(expenses),
-            "salary_records_count": len(salary_records)
+            "salary_breakdown": dict(salary_breakdown),
+            "donations_count": summary.get("donations_count", 0),
+            "expenses_count": summary.get("expenses_count", 0),
+            "salary_records_count": summary.get("salary_records_count", 0)
         }
     
-    def generate_report(
+    async def generate_report(
         self,
         report_type: str,
         date_from: Optional[str] = None,
@@ -234,33 +298,37 @@ class FinancialReportGenerator:
         start_date, end_date = self.get_date_range(report_type, date_from, date_to)
         
         # Aggregate current period data
-        current_data = self.aggregate_financial_data(start_date, end_date)
+        current_data = await self.aggregate_financial_data(start_date, end_date)
         
         # Get previous period for comparison
         comparison = None
         if include_comparison:
             try:
                 prev_start, prev_end = self.get_previous_period(report_type, start_date, end_date)
-                prev_data = self.aggregate_financial_data(prev_start, prev_end)
+                
+                # Nothing was recorded before the first activity: skip the query
+                first_activity = await self._first_activity_date()
+                if first_activity is not None and prev_end < first_activity:
+                    prev_data = _EMPTY_PERIOD
+                else:
+                    prev_data = await self.aggregate_financial_data(prev_start, prev_end)
+                
+                prev_income = prev_data["total_income"]
+                prev_expenses = prev_data["total_expenses"]
+                prev_net = prev_data["net_profit_loss"]
+                income_change = current_data["total_income"] - prev_income
+                expenses_change = current_data["total_expenses"] - prev_expenses
+                net_change = current_data["net_profit_loss"] - prev_net
                 
                 comparison = {
                     "previous_period_start": prev_start.isoformat(),
                     "previous_period_end": prev_end.isoformat(),
-                    "income_change": current_data["total_income"] - prev_data["total_income"],
-                    "income_change_percent": (
-                        ((current_data["total_income"] - prev_data["total_income"]) / prev_data["total_income"] * 100)
-                        if prev_data["total_income"] > 0 else 0
-                    ),
-                    "expenses_change": current_data["total_expenses"] - prev_data["total_expenses"],
-                    "expenses_change_percent": (
-                        ((current_data["total_expenses"] - prev_data["total_expenses"]) / prev_data["total_expenses"] * 100)
-                        if prev_data["total_expenses"] > 0 else 0
-                    ),
-                    "net_change": current_data["net_profit_loss"] - prev_data["net_profit_loss"],
-                    "net_change_percent": (
-                        ((current_data["net_profit_loss"] - prev_data["net_profit_loss"]) / abs(prev_data["net_profit_loss"]) * 100)
-                        if prev_data["net_profit_loss"] != 0 else 0
-                    )
+                    "income_change": income_change,
+                    "income_change_percent": (income_change / prev_income * 100) if prev_income > 0 else 0,
+                    "expenses_change": expenses_change,
+                    "expenses_change_percent": (expenses_change / prev_expenses * 100) if prev_expenses > 0 else 0,
+                    "net_change": net_change,
+                    "net_change_percent": (net_change / abs(prev_net) * 100) if prev_net != 0 else 0
                 }
             except Exception as e:
                 logger.warning(f"Could not generate comparison: {e}")
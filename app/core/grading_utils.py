@@ -1,8 +1,92 @@
 """Grade calculation utilities for the School Management System."""
-from typing import Dict, Optional, List
+from bisect import bisect_right
+from typing import Any, Callable, Dict, Optional, List, Sequence, Tuple
+from cachetools import LRUCache, TTLCache
 from app.core.config import settings
 from supabase import Client as SupabaseClient
 
+# The active scheme is global and changes rarely; grading endpoints read it
+# on every write. Single entry, dropped by invalidate_grading_scheme_cache().
+GRADING_SCHEME_CACHE_TTL_SECONDS = 300
+_ACTIVE_SCHEME_KEY = "active"
+_grading_scheme_cache: TTLCache = TTLCache(maxsize=1, ttl=GRADING_SCHEME_CACHE_TTL_SECONDS)
+
+# Default letter grade -> GPA mapping (used when no criteria are given)
+_DEFAULT_GPA = {
+    "A+": 4.0,
+    "A": 4.0,
+    "B+": 3.5,
+    "B": 3.0,
+    "C+": 2.5,
+    "C": 2.0,
+    "D": 1.0,
+    "F": 0.0
+}
+
+# Lookup structures derived from a criteria list, keyed by id(criteria) ->
+# (criteria, value). The list itself is kept so its id can't be reused by
+# another list while the entry is cached.
+_criteria_index_cache: LRUCache = LRUCache(maxsize=32)
+_criteria_bounds_cache: LRUCache = LRUCache(maxsize=32)
+
+
+def _per_criteria(cache: LRUCache, criteria: List[Dict], build: Callable[[List[Dict]], Any]) -> Any:
+    """Return build(criteria), computed once per criteria list."""
+    entry = cache.get(id(criteria))
+    if entry is not None and entry[0] is criteria:
+        return entry[1]
+    value = build(criteria)
+    cache[id(criteria)] = (criteria, value)
+    return value
+
+
+def _build_criteria_index(criteria: List[Dict]) -> Dict[str, Tuple[float, bool]]:
+    index = {}
+    for criterion in criteria:
+        index.setdefault(
+            criterion.get("grade_name", "").upper(),
+            (float(criterion.get("gpa_value", 0.0)), bool(criterion.get("is_passing", True)))
+        )
+    return index
+
+
+def _criteria_index(criteria: List[Dict]) -> Dict[str, Tuple[float, bool]]:
+    """
+    Map upper-cased grade name -> (gpa_value, is_passing) for a criteria list.
+    
+    Built once per list; the first criterion wins on duplicate names, as the
+    linear lookups did.
+    """
+    return _per_criteria(_criteria_index_cache, criteria, _build_criteria_index)
+
+
+def _build_criteria_bounds(criteria: List[Dict]) -> Tuple[Optional[List[float]], List[Tuple[float, float, str]], str]:
+    # Highest display_order first: the order ranges are checked in
+    ordered = sorted(criteria, key=lambda x: x.get("display_order", 0), reverse=True)
+    ranges = [
+        (float(c.get("min_marks", 0)), float(c.get("max_marks", 100)), c.get("grade_name", "F"))
+        for c in ordered
+    ]
+    # No match: the lowest display_order grade
+    fallback = min(ordered, key=lambda x: x.get("display_order", 0)).get("grade_name", "F")
+    
+    by_min = sorted(ranges, key=lambda r: (r[0], r[1]))
+    if all(lower[1] < upper[0] for lower, upper in zip(by_min, by_min[1:])):
+        # Disjoint ranges: at most one contains any mark, so binary search
+        # over the lower bounds gives the same answer as the ordered scan
+        return [r[0] for r in by_min], by_min, fallback
+    return None, ranges, fallback
+
+
+def _criteria_bounds(criteria: List[Dict]) -> Tuple[Optional[List[float]], List[Tuple[float, float, str]], str]:
+    """
+    Precomputed (min_marks list, (min, max, grade) ranges, fallback grade).
+    
+    For disjoint ranges they are sorted by min_marks for bisect; otherwise the
+    min_marks list is None and ranges keep the display_order priority.
+    """
+    return _per_criteria(_criteria_bounds_cache, criteria, _build_criteria_bounds)
+
 
 def calculate_grade(marks: float, grading_system: str = "standard", criteria: Optional[List[Dict]] = None) -> str:
     """
@@ -26,16 +110,18 @@ def calculate_grade(marks: float, grading_system: str = "standard", criteria: Op
     
     # Use custom criteria if provided
     if criteria:
-        # Sort by display_order (highest first) to check from top grades down
-        sorted_criteria = sorted(criteria, key=lambda x: x.get("display_order", 0), reverse=True)
-        for criterion in sorted_criteria:
-            min_marks = float(criterion.get("min_marks", 0))
-            max_marks = float(criterion.get("max_marks", 100))
-            if min_marks <= marks <= max_marks:
-                return criterion.get("grade_name", "F")
+        mins, ranges, fallback = _criteria_bounds(criteria)
+        if mins is not None:
+            i = bisect_right(mins, marks) - 1
+            if i >= 0 and marks <= ranges[i][1]:
+                return ranges[i][2]
+        else:
+            # Overlapping ranges: check from top grades (highest display_order) down
+            for min_marks, max_marks, grade_name in ranges:
+                if min_marks <= marks <= max_marks:
+                    return grade_name
         # If no match found, return lowest grade
-        if sorted_criteria:
-            return sorted(sorted_criteria, key=lambda x: x.get("display_order", 0))[0].get("grade_name", "F")
+        return fallback
     
     # Fallback to hardcoded systems
     if grading_system == "strict":
@@ -81,6 +167,45 @@ def calculate_grade(marks: float, grading_system: str = "standard", criteria: Op
     return "F"
 
 
+def calculate_grades_bulk(
+    marks: Sequence[float],
+    grading_system: str = "standard",
+    criteria: Optional[List[Dict]] = None
+) -> List[str]:
+    """
+    Calculate letter grades for many marks (0-100) at once.
+    
+    Same result as calling calculate_grade for each mark, but the range check
+    runs once and the criteria boundaries are resolved once for the batch.
+    
+    Args:
+        marks: Numeric marks (0-100)
+        grading_system: Fallback grading system when no criteria are given
+        criteria: List of grading criteria dicts with keys: grade_name, min_marks, max_marks
+    
+    Returns:
+        Letter grades in the same order as marks
+    """
+    if not marks:
+        return []
+    
+    lowest, highest = min(marks), max(marks)
+    if lowest < 0 or highest > 100:
+        raise ValueError(f"Marks must be between 0 and 100, got {lowest if lowest < 0 else highest}")
+    
+    if criteria:
+        mins, ranges, fallback = _criteria_bounds(criteria)
+        if mins is not None:
+            grades = []
+            append = grades.append
+            for mark in marks:
+                i = bisect_right(mins, mark) - 1
+                append(ranges[i][2] if i >= 0 and mark <= ranges[i][1] else fallback)
+            return grades
+    
+    return [calculate_grade(mark, grading_system, criteria) for mark in marks]
+
+
 def grade_to_gpa(grade: str, criteria: Optional[List[Dict]] = None) -> float:
     """
     Convert letter grade to GPA (0.0 to 4.0 scale).
@@ -92,24 +217,16 @@ def grade_to_gpa(grade: str, criteria: Optional[List[Dict]] = None) -> float:
     Returns:
         GPA value (0.0 to 4.0)
     """
+    grade = grade.upper()
+    
     # Use custom criteria if provided
     if criteria:
-        for criterion in criteria:
-            if criterion.get("grade_name", "").upper() == grade.upper():
-                return float(criterion.get("gpa_value", 0.0))
+        match = _criteria_index(criteria).get(grade)
+        if match is not None:
+            return match[0]
     
     # Fallback to default mapping
-    gpa_map = {
-        "A+": 4.0,
-        "A": 4.0,
-        "B+": 3.5,
-        "B": 3.0,
-        "C+": 2.5,
-        "C": 2.0,
-        "D": 1.0,
-        "F": 0.0
-    }
-    return gpa_map.get(grade.upper(), 0.0)
+    return _DEFAULT_GPA.get(grade, 0.0)
 
 
 def is_passing_grade(grade: str, criteria: Optional[List[Dict]] = None) -> bool:
@@ -123,26 +240,34 @@ def is_passing_grade(grade: str, criteria: Optional[List[Dict]] = None) -> bool:
     Returns:
         True if passing, False if failing
     """
+    grade = grade.upper()
+    
     # Use custom criteria if provided
     if criteria:
-        for criterion in criteria:
-            if criterion.get("grade_name", "").upper() == grade.upper():
-                return bool(criterion.get("is_passing", True))
+        match = _criteria_index(criteria).get(grade)
+        if match is not None:
+            return match[1]
     
     # Fallback to default (F is failing)
-    return grade.upper() != "F"
+    return grade != "F"
 
 
 def get_active_grading_scheme(db: SupabaseClient) -> Optional[Dict]:
     """
     Get the active/default grading scheme from database.
     
+    Cached for GRADING_SCHEME_CACHE_TTL_SECONDS; failed lookups are not cached.
+    
     Args:
         db: Supabase client
     
     Returns:
         Dict with scheme and criteria, or None if not found
     """
+    cached = _grading_scheme_cache.get(_ACTIVE_SCHEME_KEY)
+    if cached is not None:
+        return cached
+    
     try:
         # Try to get default scheme first
         default_response = db.table("grading_schemes").select("*").eq("is_default", True).eq("is_active", True).single().execute()
@@ -159,10 +284,12 @@ def get_active_grading_scheme(db: SupabaseClient) -> Optional[Dict]:
         # Fetch criteria
         criteria_response = db.table("grading_criteria").select("*").eq("grading_scheme_id", scheme["id"]).order("display_order").execute()
         
-        return {
+        active_scheme = {
             "scheme": scheme,
             "criteria": criteria_response.data or []
         }
+        _grading_scheme_cache[_ACTIVE_SCHEME_KEY] = active_scheme
+        return active_scheme
     except Exception as e:
         # Log error but return None gracefully
         from app.core.logging_config import get_logger
@@ -171,6 +298,11 @@ def get_active_grading_scheme(db: SupabaseClient) -> Optional[Dict]:
         return None
 
 
+def invalidate_grading_scheme_cache() -> None:
+    """Drop the cached active grading scheme after schemes or criteria change."""
+    _grading_scheme_cache.clear()
+
+
 def calculate_gpa(grades: list[str], criteria: Optional[List[Dict]] = None) -> Optional[float]:
     """
     Calculate overall GPA from a list of grades.
@@ -185,7 +317,16 @@ def calculate_gpa(grades: list[str], criteria: Optional[List[Dict]] = None) -> O
     if not grades:
         return None
     
-    total_gpa = sum(grade_to_gpa(grade, criteria=criteria) for grade in grades)
+    if criteria:
+        # Resolve the index once instead of per grade
+        lookup = _criteria_index(criteria).get
+        total_gpa = 0.0
+        for grade in grades:
+            grade = grade.upper()
+            match = lookup(grade)
+            total_gpa += match[0] if match is not None else _DEFAULT_GPA.get(grade, 0.0)
+    else:
+        total_gpa = sum(_DEFAULT_GPA.get(grade.upper(), 0.0) for grade in grades)
     return round(total_gpa / len(grades), 2)
 
 
@@ -10,6 +10,9 @@ def generate_invoice_number(db_client, month: int, year: int) -> str:
     """
     Generate unique invoice number in format: INV-YYYY-MM-XXXXX
     
+    Numbers come from the generate_invoice_number database function, which
+    keeps a per-month counter so concurrent invoices never share a number.
+    
     Args:
         db_client: Supabase client
         month: Month (1-12)
@@ -19,25 +22,11 @@ def generate_invoice_number(db_client, month: int, year: int) -> str:
         Invoice number string
     """
     try:
-        # Get count of invoices for this month/year
-        start_date = f"{year}-{month:02d}-01"
-        if month == 12:
-            end_date = f"{year + 1}-01-01"
-        else:
-            end_date = f"{year}-{month + 1:02d}-01"
-        
-        # Count existing invoices in this month/year
-        response = db_client.table("invoices")\
-            .select("invoice_number", count="exact")\
-            .gte("invoice_date", start_date)\
-            .lt("invoice_date", end_date)\
-            .execute()
-        
-        count = response.count or 0
-        
-        # Generate sequential number (5 digits, zero-padded)
-        sequence_number = count + 1
-        invoice_number = f"INV-{year}-{month:02d}-{sequence_number:05d}"
+        response = db_client.rpc(
+            "generate_invoice_number",
+            {"p_year": year, "p_month": month}
+        ).execute()
+        invoice_number = response.data
         
         logger.debug(f"Generated invoice number: {invoice_number}")
         return invoice_number
@@ -176,20 +165,15 @@ def update_invoice_status_if_overdue(db_client) -> int:
     try:
         today = date.today()
         
-        # Find invoices that are past due and not already paid/cancelled/overdue
+        # Mark invoices that are past due and not already paid/cancelled/overdue
+        # in one statement; the updated rows come back as the representation
         response = db_client.table("invoices")\
-            .select("id")\
+            .update({"status": "overdue"})\
             .lt("due_date", today.isoformat())\
             .in_("status", ["draft", "sent"])\
             .execute()
         
-        updated_count = 0
-        for invoice in response.data:
-            db_client.table("invoices")\
-                .update({"status": "overdue"})\
-                .eq("id", invoice["id"])\
-                .execute()
-            updated_count += 1
+        updated_count = len(response.data or [])
         
         if updated_count > 0:
             logger.info(f"Updated {updated_count} invoices to overdue status")
@@ -0,0 +1,45 @@
+"""Import rarely used endpoint modules on their first request instead of at startup."""
+import importlib
+from typing import Dict, Tuple
+from fastapi import FastAPI
+from starlette.types import ASGIApp, Receive, Scope, Send
+from app.core.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+
+class LazyRouterMiddleware:
+    """
+    Include deferred routers into the app the first time a request hits their prefix.
+
+    Plain ASGI middleware: once every deferred router is loaded it only costs
+    an empty-dict check per request.
+
+    Args:
+        app: Next ASGI application
+        fastapi_app: Application the routers are included into
+        lazy_routes: Mapping of full path prefix (e.g. "/api/v1/reports")
+            to (module path, OpenAPI tag)
+    """
+
+    def __init__(self, app: ASGIApp, fastapi_app: FastAPI, lazy_routes: Dict[str, Tuple[str, str]]):
+        self.app = app
+        self.fastapi_app = fastapi_app
+        self.pending = dict(lazy_routes)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if self.pending and scope["type"] == "http":
+            path = scope["path"]
+            for prefix in list(self.pending):
+                if path == prefix or path.startswith(prefix + "/"):
+                    self._load(prefix)
+        await self.app(scope, receive, send)
+
+    def _load(self, prefix: str) -> None:
+        module_path, tag = self.pending[prefix]
+        module = importlib.import_module(module_path)
+        self.fastapi_app.include_router(module.router, prefix=prefix, tags=[tag])
+        # Regenerate the OpenAPI schema with the new routes
+        self.fastapi_app.openapi_schema = None
+        del self.pending[prefix]
+        logger.info(f"Loaded endpoint module {module_path} on first request to {prefix}")
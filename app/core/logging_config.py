@@ -1,12 +1,85 @@
 """Logging configuration for the School Management System."""
+import atexit
 import logging
+import os
+import queue
 import sys
 from pathlib import Path
-from logging.handlers import RotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from typing import Optional
 
 from app.core.config import settings
 
+# Background thread writing the log files (see _add_file_handlers)
+_file_listener: Optional[QueueListener] = None
+
+
+def _add_file_handlers(root_logger: logging.Logger) -> None:
+    """
+    Attach rotating app/error log files if the logs directory is writable.
+    
+    Records go through a QueueHandler; a QueueListener thread does the file
+    writes, so disk I/O never blocks the request thread.
+    """
+    global _file_listener
+    
+    log_dir = Path("logs")
+    # Probe permissions instead of attempting (and failing) the mkdir
+    if not os.access(log_dir if log_dir.exists() else Path.cwd(), os.W_OK):
+        root_logger.warning("File logging not available, using console logging only")
+        return
+    
+    detailed_formatter = logging.Formatter(
+        fmt='%(asctime)s - %(name)s - %(levelname)s - %(funcName)s:%(lineno)d - %(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S'
+    )
+    
+    try:
+        log_dir.mkdir(exist_ok=True)
+        
+        # delay=True: files are opened on the first record, not at startup
+        file_handler = RotatingFileHandler(
+            filename=log_dir / "app.log",
+            maxBytes=10 * 1024 * 1024,  # 10MB
+            backupCount=5,
+            encoding='utf-8',
+            delay=True
+        )
+        file_handler.setLevel(logging.DEBUG)
+        file_handler.setFormatter(detailed_formatter)
+        
+        # Error file handler (only errors and above)
+        error_handler = RotatingFileHandler(
+            filename=log_dir / "errors.log",
+            maxBytes=10 * 1024 * 1024,  # 10MB
+            backupCount=5,
+            encoding='utf-8',
+            delay=True
+        )
+        error_handler.setLevel(logging.ERROR)
+        error_handler.setFormatter(detailed_formatter)
+        
+        # Replace the listener from a previous setup_logging() call
+        if _file_listener is not None:
+            _file_listener.stop()
+            for handler in _file_listener.handlers:
+                handler.close()
+        
+        log_queue = queue.SimpleQueue()
+        _file_listener = QueueListener(log_queue, file_handler, error_handler, respect_handler_level=True)
+        _file_listener.start()
+        root_logger.addHandler(QueueHandler(log_queue))
+    except (PermissionError, OSError):
+        # If file logging fails, continue with console logging only
+        root_logger.warning("File logging not available, using console logging only")
+
+
+@atexit.register
+def _stop_file_listener() -> None:
+    """Flush queued records to the log files on shutdown."""
+    if _file_listener is not None:
+        _file_listener.stop()
+
 
 def setup_logging(log_level: Optional[str] = None) -> None:
     """
@@ -21,21 +94,7 @@ def setup_logging(log_level: Optional[str] = None) -> None:
     else:
         level = logging.DEBUG if settings.DEBUG else logging.INFO
     
-    # Create logs directory if it doesn't exist
-    # In Docker/production, logs go to stdout/stderr, so file logging is optional
-    log_dir = Path("logs")
-    try:
-        log_dir.mkdir(exist_ok=True)
-    except (PermissionError, OSError):
-        # If we can't create logs directory (e.g., in some Docker setups), skip file logging
-        log_dir = None
-    
     # Create formatters
-    detailed_formatter = logging.Formatter(
-        fmt='%(asctime)s - %(name)s - %(levelname)s - %(funcName)s:%(lineno)d - %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
-    )
-    
     simple_formatter = logging.Formatter(
         fmt='%(asctime)s - %(levelname)s - %(message)s',
         datefmt='%Y-%m-%d %H:%M:%S'
@@ -54,32 +113,10 @@ def setup_logging(log_level: Optional[str] = None) -> None:
     console_handler.setFormatter(simple_formatter)
     root_logger.addHandler(console_handler)
     
-    # File handler with rotation (detailed format) - only if log directory is writable
-    if log_dir:
-        try:
-            file_handler = RotatingFileHandler(
-                filename=log_dir / "app.log",
-                maxBytes=10 * 1024 * 1024,  # 10MB
-                backupCount=5,
-                encoding='utf-8'
-            )
-            file_handler.setLevel(logging.DEBUG)
-            file_handler.setFormatter(detailed_formatter)
-            root_logger.addHandler(file_handler)
-            
-            # Error file handler (only errors and above)
-            error_handler = RotatingFileHandler(
-                filename=log_dir / "errors.log",
-                maxBytes=10 * 1024 * 1024,  # 10MB
-                backupCount=5,
-                encoding='utf-8'
-            )
-            error_handler.setLevel(logging.ERROR)
-            error_handler.setFormatter(detailed_formatter)
-            root_logger.addHandler(error_handler)
-        except (PermissionError, OSError):
-            # If file logging fails, continue with console logging only
-            root_logger.warning("File logging not available, using console logging only")
+    # File logging is optional: in Docker/serverless, logs go to stdout/stderr
+    # and the filesystem may be read-only
+    if settings.ENABLE_FILE_LOGS:
+        _add_file_handlers(root_logger)
     
     # Suppress noisy third-party loggers
     logging.getLogger("uvicorn.access").setLevel(logging.WARNING)
@@ -0,0 +1,71 @@
+"""Prometheus metrics for the School Management System."""
+import time
+from prometheus_client import Counter, Histogram
+
+# Latency buckets shared by HTTP and Supabase histograms (seconds)
+LATENCY_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5]
+
+# PostgREST HTTP method -> query operation
+_METHOD_OPS = {
+    "GET": "select",
+    "HEAD": "select",
+    "POST": "insert",
+    "PATCH": "update",
+    "PUT": "upsert",
+    "DELETE": "delete",
+}
+
+supabase_call_duration = Histogram(
+    "supabase_call_duration_seconds",
+    "Duration of Supabase (PostgREST) calls",
+    ["table", "op"],
+    buckets=LATENCY_BUCKETS,
+)
+
+profile_fetch_errors = Counter(
+    "profile_fetch_errors_total",
+    "Failed profile/email lookups while populating user data",
+)
+
+profile_breaker_opens = Counter(
+    "profile_breaker_open_total",
+    "Times the profile lookup circuit breaker opened",
+)
+
+
+def _on_request(request) -> None:
+    # The session's httpx client also carries GoTrue calls; only time PostgREST
+    if "/rest/v1/" in request.url.path:
+        request.extensions["metrics_start"] = time.perf_counter()
+
+
+def _on_response(response) -> None:
+    request = response.request
+    start = request.extensions.get("metrics_start")
+    if start is None:
+        return
+
+    # /rest/v1/<table> or /rest/v1/rpc/<function>
+    table = request.url.path.split("/rest/v1/", 1)[-1].strip("/") or "unknown"
+    op = "rpc" if table.startswith("rpc/") else _METHOD_OPS.get(request.method, request.method.lower())
+    supabase_call_duration.labels(table=table, op=op).observe(time.perf_counter() - start)
+
+
+def instrument_client(client):
+    """
+    Record the duration of every PostgREST call made through a Supabase client.
+
+    Safe to call more than once on the same client.
+
+    Args:
+        client: Supabase client instance
+
+    Returns:
+        The same client, for chaining
+    """
+    session = client.postgrest.session
+    if not getattr(session, "_metrics_instrumented", False):
+        session.event_hooks["request"].append(_on_request)
+        session.event_hooks["response"].append(_on_response)
+        session._metrics_instrumented = True
+    return client
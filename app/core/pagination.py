@@ -0,0 +1,65 @@
+"""Keyset (cursor) pagination helpers for PostgREST list queries."""
+import base64
+import binascii
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import UUID
+from fastapi import HTTPException, status
+
+# Response header carrying the cursor for the next page (absent on the last page)
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(row: Dict[str, Any]) -> str:
+    """Encode a row's (created_at, id) position as an opaque cursor."""
+    raw = f"{row['created_at']}|{row['id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Tuple[str, str]]:
+    """
+    Decode a cursor produced by encode_cursor.
+
+    Both parts are validated (timestamp and UUID) before they are placed in a
+    PostgREST filter.
+
+    Raises:
+        HTTPException: 400 if the cursor is malformed
+    """
+    if not cursor:
+        return None
+    try:
+        created_at, row_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        datetime.fromisoformat(created_at)
+        UUID(row_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+    return created_at, row_id
+
+
+def apply_keyset(query, cursor: Optional[Tuple[str, str]]):
+    """
+    Order a query newest first by (created_at, id) and resume after the cursor row.
+
+    Each page is an index range scan, so deep pages cost the same as the first.
+
+    Args:
+        query: PostgREST select query builder
+        cursor: Decoded cursor from decode_cursor, or None for the first page
+    """
+    if cursor:
+        created_at, row_id = cursor
+        query = query.or_(
+            f'created_at.lt."{created_at}",and(created_at.eq."{created_at}",id.lt.{row_id})'
+        )
+    return query.order("created_at", desc=True).order("id", desc=True)
+
+
+def next_cursor(rows: List[Dict[str, Any]], limit: int) -> Optional[str]:
+    """Cursor for the page after `rows`, or None when this was the last page."""
+    if len(rows) < limit:
+        return None
+    return encode_cursor(rows[-1])
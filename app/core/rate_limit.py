@@ -1,162 +1,279 @@
 """Rate limiting middleware for API protection."""
-from fastapi import Request, HTTPException, status
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.responses import Response
-from collections import defaultdict
-from datetime import datetime, timedelta
-from typing import Dict, Tuple
-import time
+from fastapi import status
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import sys
+from time import monotonic
+import orjson
 from app.core.logging_config import get_logger
 
 logger = get_logger(__name__)
 
+# Health checks, metrics scraping (token-protected, or not served at all)
+# and API docs are never rate limited
+_SKIP_PATHS = frozenset({"/health", "/", "/metrics", "/api/docs", "/api/redoc", "/api/openapi.json"})
+_SKIP_PREFIXES = ("/static/", "/api/docs/")
 
-class RateLimitMiddleware(BaseHTTPMiddleware):
+_RETRY_AFTER_SECONDS = 60
+
+# Per-IP state is split across this many dicts (a power of two) so cleanup
+# can sweep one shard at a time
+_SHARDS = 64
+
+
+def _window_count(state: List[float], i: int, window: float, now: float) -> float:
+    """
+    Sliding-window-counter estimate of requests in the last `window` seconds.
+    
+    state[i:i + 3] is [window_start, previous_count, current_count]; it is
+    rolled forward to the window containing `now` first. The previous
+    window's count is weighted by how much of it still overlaps.
     """
-    Simple in-memory rate limiting middleware.
-    For production with multiple workers, consider using Redis-based rate limiting.
+    elapsed = now - state[i]
+    if elapsed >= window:
+        periods = elapsed // window
+        state[i + 1] = state[i + 2] if periods == 1 else 0
+        state[i + 2] = 0
+        state[i] += periods * window
+        elapsed -= periods * window
+    return state[i + 1] * (1 - elapsed / window) + state[i + 2]
+
+
+class RateLimitMiddleware:
+    """
+    Simple in-memory rate limiting middleware (plain ASGI).
+    
+    Each client IP gets a token bucket for the per-second burst limit and
+    sliding window counters for the per-minute and per-hour limits, so every
+    check is O(1) and uses a fixed amount of memory per IP.
+    
+    State lives in the worker process, so with several workers each one
+    enforces the limits separately (configure them per worker).
     """
     
     def __init__(
         self,
-        app,
+        app: ASGIApp,
         requests_per_minute: int = 60,
         requests_per_hour: int = 1000,
         burst_size: int = 10
     ):
-        super().__init__(app)
+        self.app = app
         self.requests_per_minute = requests_per_minute
         self.requests_per_hour = requests_per_hour
         self.burst_size = burst_size
         
-        # Store request timestamps per IP
-        # Format: {ip: [(timestamp, count), ...]}
-        self.request_history: Dict[str, list] = defaultdict(list)
+        # Rate limit state per IP, updated on access, sharded by hash(ip)
+        # Format: {ip: [burst_tokens, last_refill,
+        #               minute_start, previous_minute, current_minute,
+        #               hour_start, previous_hour, current_hour]}
+        self.shards: List[Dict[str, List[float]]] = [{} for _ in range(_SHARDS)]
         
-        # Cleanup interval (clean old entries every 5 minutes)
-        self.last_cleanup = time.time()
+        # Burst bucket refill rate in tokens per second
+        self.burst_rate = float(burst_size)
+        
+        # Cleanup interval (every shard is swept once every 5 minutes, one
+        # shard per cleanup_interval / _SHARDS seconds, off the request path)
         self.cleanup_interval = 300  # 5 minutes
+        self.cleanup_cursor = 0
+        self.cleanup_task: Optional[asyncio.Task] = None
+        
+        # Static response headers, built once as raw ASGI header pairs
+        self.rate_headers = [
+            (b"x-ratelimit-limit-perminute", str(requests_per_minute).encode()),
+            (b"x-ratelimit-limit-perhour", str(requests_per_hour).encode()),
+        ]
+        
+        # Rejection reasons and their pre-rendered 429 bodies and headers
+        # (body in the same shape as the app's error responses)
+        self.burst_reason = f"Burst limit exceeded: {burst_size} requests/second"
+        self.minute_reason = f"Rate limit exceeded: {requests_per_minute} requests/minute"
+        self.hour_reason = f"Rate limit exceeded: {requests_per_hour} requests/hour"
+        self.rejections: Dict[str, Tuple[bytes, List[Tuple[bytes, bytes]]]] = {}
+        for reason in (self.burst_reason, self.minute_reason, self.hour_reason):
+            body = orjson.dumps({
+                "error": True,
+                "message": "Rate limit exceeded",
+                "error_code": "RATE_LIMIT_EXCEEDED",
+                "details": reason,
+                "retry_after": _RETRY_AFTER_SECONDS
+            })
+            self.rejections[reason] = (body, [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(_RETRY_AFTER_SECONDS).encode()),
+            ])
     
-    def _get_client_ip(self, request: Request) -> str:
-        """Extract client IP address from request."""
-        # Check for forwarded headers (for reverse proxies)
-        forwarded_for = request.headers.get("X-Forwarded-For")
+    def _get_client_ip(self, scope: Scope) -> str:
+        """
+        Extract client IP address from the ASGI scope.
+        
+        The result is interned: a busy IP's state key and every per-request
+        copy of it share one string object.
+        """
+        # Check for forwarded headers (for reverse proxies) in one pass over
+        # the raw ASGI headers (names are lowercase bytes)
+        forwarded_for = real_ip = None
+        for name, value in scope["headers"]:
+            if name == b"x-forwarded-for" and value:
+                forwarded_for = value
+                break
+            if name == b"x-real-ip":
+                real_ip = value
+        
         if forwarded_for:
             # Take the first IP in the chain
-            return forwarded_for.split(",")[0].strip()
+            return sys.intern(forwarded_for.split(b",", 1)[0].strip().decode("latin-1"))
         
-        real_ip = request.headers.get("X-Real-IP")
         if real_ip:
-            return real_ip
+            return sys.intern(real_ip.decode("latin-1"))
         
         # Fallback to direct connection IP
-        if request.client:
-            return request.client.host
+        client = scope.get("client")
+        if client:
+            return sys.intern(client[0])
         
         return "unknown"
     
-    def _cleanup_old_entries(self):
-        """Remove old entries to prevent memory leaks."""
-        current_time = time.time()
-        if current_time - self.last_cleanup < self.cleanup_interval:
-            return
-        
-        cutoff_time = current_time - 3600  # 1 hour ago
-        
-        # Clean up old entries
-        ips_to_remove = []
-        for ip, timestamps in self.request_history.items():
-            # Keep only recent entries (within last hour)
-            self.request_history[ip] = [
-                ts for ts in timestamps if ts[0] > cutoff_time
-            ]
-            
-            # Remove IP if no entries left
-            if not self.request_history[ip]:
-                ips_to_remove.append(ip)
-        
-        for ip in ips_to_remove:
-            del self.request_history[ip]
+    async def _cleanup_loop(self):
+        """Background task: sweep the next shard every cleanup_interval / _SHARDS seconds."""
+        while True:
+            await asyncio.sleep(self.cleanup_interval / _SHARDS)
+            try:
+                self._cleanup_old_entries(monotonic())
+            except Exception as e:
+                logger.warning(f"Rate limit cleanup failed: {e}")
+    
+    def close(self):
+        """Cancel the cleanup task (application shutdown)."""
+        if self.cleanup_task is not None:
+            self.cleanup_task.cancel()
+            self.cleanup_task = None
+    
+    def _cleanup_old_entries(self, current_time: float):
+        """Drop IPs with no requests in the last two windows (same as never seen)."""
+        shard = self.shards[self.cleanup_cursor]
+        self.cleanup_cursor = (self.cleanup_cursor + 1) % _SHARDS
         
-        self.last_cleanup = current_time
+        # Both windows are two periods old, so their counts have dropped to
+        # zero, and the burst bucket refilled long ago
+        idle_ips = [
+            ip for ip, state in shard.items()
+            if current_time - state[2] >= 120 and current_time - state[5] >= 7200
+        ]
+        for ip in idle_ips:
+            del shard[ip]
     
-    def _check_rate_limit(self, ip: str, current_time: float) -> Tuple[bool, str]:
+    def _check_rate_limit(self, ip: str, current_time: float) -> Tuple[bool, str, int, int]:
         """
         Check if request should be allowed based on rate limits.
         
+        Runs on the event loop and never awaits, so each IP's state is read
+        and updated without interleaving; keep it synchronous (no locks needed).
+        It runs on every request, so it sticks to plain comparisons and
+        arithmetic (no min/max calls).
+        
         Returns:
-            (allowed: bool, reason: str)
+            (allowed: bool, reason: str, remaining_minute: int, remaining_hour: int)
         """
-        # Cleanup old entries periodically
-        self._cleanup_old_entries()
+        shard = self.shards[hash(ip) & (_SHARDS - 1)]
+        state = shard.get(ip)
+        if state is None:
+            # New IP: full burst bucket, empty windows starting now
+            state = [float(self.burst_size), current_time, current_time, 0, 0, current_time, 0, 0]
+            shard[ip] = state
+        else:
+            # Refill the burst bucket for the time since the last request
+            tokens = state[0] + (current_time - state[1]) * self.burst_rate
+            state[0] = tokens if tokens < self.burst_size else self.burst_size
+            state[1] = current_time
         
-        # Get request history for this IP
-        history = self.request_history[ip]
+        # Check limits (a rejected request isn't counted)
+        if state[0] < 1:
+            return False, self.burst_reason, 0, 0
         
-        # Remove entries older than 1 hour
-        hour_ago = current_time - 3600
-        history = [ts for ts in history if ts[0] > hour_ago]
+        minute_count = _window_count(state, 2, 60, current_time)
+        if minute_count >= self.requests_per_minute:
+            return False, self.minute_reason, 0, 0
         
-        # Count requests in last minute
-        minute_ago = current_time - 60
-        requests_last_minute = sum(1 for ts, _ in history if ts > minute_ago)
+        hour_count = _window_count(state, 5, 3600, current_time)
+        if hour_count >= self.requests_per_hour:
+            return False, self.hour_reason, 0, 0
         
-        # Count requests in last hour
-        requests_last_hour = len(history)
+        # Count the request
+        state[0] -= 1
+        state[4] += 1
+        state[7] += 1
         
-        # Check burst limit (requests in last second)
-        second_ago = current_time - 1
-        requests_last_second = sum(1 for ts, _ in history if ts > second_ago)
-        
-        # Check limits
-        if requests_last_second >= self.burst_size:
-            return False, f"Burst limit exceeded: {self.burst_size} requests/second"
-        
-        if requests_last_minute >= self.requests_per_minute:
-            return False, f"Rate limit exceeded: {self.requests_per_minute} requests/minute"
+        # Each count is below its limit here, so int() (truncating) is >= 0
+        return (
+            True,
+            "OK",
+            int(self.requests_per_minute - minute_count - 1),
+            int(self.requests_per_hour - hour_count - 1),
+        )
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """Process request with rate limiting."""
+        if scope["type"] == "lifespan":
+            # Stop the cleanup task when the server shuts down
+            async def receive_shutdown() -> Message:
+                message = await receive()
+                if message["type"] == "lifespan.shutdown":
+                    self.close()
+                return message
+            
+            await self.app(scope, receive_shutdown, send)
+            return
         
-        if requests_last_hour >= self.requests_per_hour:
-            return False, f"Rate limit exceeded: {self.requests_per_hour} requests/hour"
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
         
-        # Add current request to history
-        history.append((current_time, 1))
-        self.request_history[ip] = history
+        # Skip rate limiting for health checks, metrics scraping and docs
+        path = scope["path"]
+        if path in _SKIP_PATHS or path.startswith(_SKIP_PREFIXES):
+            await self.app(scope, receive, send)
+            return
         
-        return True, "OK"
-    
-    async def dispatch(self, request: Request, call_next):
-        """Process request with rate limiting."""
-        # Skip rate limiting for health checks
-        if request.url.path in ["/health", "/", "/api/docs", "/api/redoc", "/api/openapi.json"]:
-            return await call_next(request)
+        # Start the cleanup task on the first request (needs the running loop)
+        if self.cleanup_task is None:
+            self.cleanup_task = asyncio.get_running_loop().create_task(self._cleanup_loop())
         
         # Get client IP
-        client_ip = self._get_client_ip(request)
+        client_ip = self._get_client_ip(scope)
         
-        # Check rate limit
-        current_time = time.time()
-        allowed, reason = self._check_rate_limit(client_ip, current_time)
+        # Check rate limit (monotonic: immune to wall-clock adjustments)
+        current_time = monotonic()
+        allowed, reason, remaining_minute, remaining_hour = self._check_rate_limit(client_ip, current_time)
         
         if not allowed:
             logger.warning(f"Rate limit exceeded for IP {client_ip}: {reason}")
-            raise HTTPException(
-                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                detail={
-                    "error": True,
-                    "message": "Rate limit exceeded",
-                    "error_code": "RATE_LIMIT_EXCEEDED",
-                    "details": reason,
-                    "retry_after": 60
-                },
-                headers={"Retry-After": "60"}
-            )
-        
-        # Add rate limit headers to response
-        response = await call_next(request)
-        response.headers["X-RateLimit-Limit-PerMinute"] = str(self.requests_per_minute)
-        response.headers["X-RateLimit-Limit-PerHour"] = str(self.requests_per_hour)
-        
-        return response
+            # Sent directly from the pre-rendered parts: no Response object,
+            # no exception handling, the app is never called. The header list
+            # is copied because outer middleware (CORS) appends to it in place
+            body, headers = self.rejections[reason]
+            await send({
+                "type": "http.response.start",
+                "status": status.HTTP_429_TOO_MANY_REQUESTS,
+                "headers": list(headers),
+            })
+            await send({"type": "http.response.body", "body": body})
+            return
+        
+        # Add rate limit headers to the response as it starts
+        rate_headers = self.rate_headers + [
+            (b"x-ratelimit-remaining-perminute", str(remaining_minute).encode()),
+            (b"x-ratelimit-remaining-perhour", str(remaining_hour).encode()),
+        ]
+        
+        async def send_with_headers(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", ())) + rate_headers
+            await send(message)
+        
+        await self.app(scope, receive, send_with_headers)
 
 
 
@@ -1,123 +1,278 @@
 """Helper functions for populating response data with user information"""
-from typing import List, Dict, Any, Optional
-from app.core.supabase import get_request_scoped_client
+import asyncio
+from time import monotonic
+from typing import List, Dict, Any, Optional, Tuple
+from fastapi import Response
+from pydantic import TypeAdapter
+from app.core.supabase import get_request_scoped_client, is_service_client
+from app.core.supabase_helpers import _PRIVILEGED_ROLES, _SUPABASE_ERRORS
+from app.core.cache import auth_user_cache, auth_user_cache_lock, profile_cache, profile_cache_lock
+from app.core.logging_config import get_logger
+from app.core.metrics import profile_breaker_opens, profile_fetch_errors
 from app.models.user import UserResponse
 
+logger = get_logger(__name__)
 
-def populate_student_user_data(
-    students: List[Dict[str, Any]], 
+_PROFILE_COLUMNS = "user_id, full_name, phone, address, avatar_url, created_at"
+# user_profiles_with_role exposes profiles.user_id as id, plus the auth email/role
+_PROFILE_WITH_AUTH_COLUMNS = "id, email, role, full_name, phone, address, avatar_url, created_at"
+
+# After this many consecutive failed lookups, skip them for _BREAKER_RESET_SECONDS
+# (records are returned without user data) instead of waiting on Supabase per request
+_BREAKER_FAIL_MAX = 5
+_BREAKER_RESET_SECONDS = 30
+_breaker_failures = 0
+_breaker_open_until = 0.0
+
+
+def _fetch_profiles(user_ids: List[str], db_client) -> Dict[str, Dict[str, Any]]:
+    """Map user_id -> profile row in at most one query.
+    
+    Service-role reads go through profile_cache, so only ids missing from it
+    are queried (none if the whole page is warm). RLS-scoped clients may see
+    fewer rows than the service role and always query directly.
+    """
+    if not is_service_client(db_client):
+        rows = db_client.table("profiles").select(_PROFILE_COLUMNS).in_("user_id", user_ids).execute().data
+        return {p.get("user_id"): p for p in rows}
+    
+    profiles_map = {}
+    missing = []
+    with profile_cache_lock:
+        for user_id in user_ids:
+            cached = profile_cache.get(user_id)
+            if cached is not None:
+                profiles_map[user_id] = cached
+            else:
+                missing.append(user_id)
+    
+    if missing:
+        rows = db_client.table("profiles").select(_PROFILE_COLUMNS).in_("user_id", missing).execute().data
+        with profile_cache_lock:
+            for p in rows:
+                profile_cache[p["user_id"]] = p
+                profiles_map[p["user_id"]] = p
+    return profiles_map
+
+
+def _fetch_profiles_with_emails(user_ids: List[str]) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, str]]:
+    """(user_id -> profile row, user_id -> email) in at most one service-role query.
+    
+    Reads the user_profiles_with_role view, which joins profiles with
+    auth.users, instead of querying profiles and then GoTrue. Ids present in
+    both profile_cache and auth_user_cache are not queried; every row read
+    refreshes both caches.
+    """
+    from app.core.supabase import supabase_admin
+    
+    profiles_map = {}
+    emails_map = {}
+    missing = []
+    with profile_cache_lock:
+        profiles = [profile_cache.get(user_id) for user_id in user_ids]
+    with auth_user_cache_lock:
+        auth_users = [auth_user_cache.get(user_id) for user_id in user_ids]
+    for user_id, profile, auth_user in zip(user_ids, profiles, auth_users):
+        if profile is not None and auth_user is not None:
+            profiles_map[user_id] = profile
+            emails_map[user_id] = auth_user["email"]
+        else:
+            missing.append(user_id)
+    
+    if missing:
+        rows = supabase_admin.table("user_profiles_with_role").select(_PROFILE_WITH_AUTH_COLUMNS)\
+            .in_("id", missing).execute().data
+        auth_users = {}
+        for row in rows:
+            user_id = row.pop("id")
+            email = row.pop("email")
+            auth_users[user_id] = {"email": email, "role": row.pop("role")}
+            row["user_id"] = user_id
+            profiles_map[user_id] = row
+            emails_map[user_id] = email
+        with auth_user_cache_lock:
+            auth_user_cache.update(auth_users)
+        with profile_cache_lock:
+            for row in rows:
+                profile_cache[row["user_id"]] = row
+    return profiles_map, emails_map
+
+
+def _fetch_auth_emails(user_ids: List[str]) -> Dict[str, str]:
+    """Map user_id -> email, querying user_profiles_with_role only for ids missing from auth_user_cache."""
+    from app.core.supabase import supabase_admin
+    
+    emails_map = {}
+    missing = []
+    with auth_user_cache_lock:
+        for user_id in user_ids:
+            cached = auth_user_cache.get(user_id)
+            if cached is not None:
+                emails_map[user_id] = cached["email"]
+            else:
+                missing.append(user_id)
+    
+    if missing:
+        rows = supabase_admin.table("user_profiles_with_role").select("id, email, role")\
+            .in_("id", missing).execute().data
+        with auth_user_cache_lock:
+            for row in rows:
+                auth_user_cache[row["id"]] = {"email": row["email"], "role": row["role"]}
+                emails_map[row["id"]] = row["email"]
+    return emails_map
+
+
+def _cached_user_data(
+    user_ids: List[str],
+    with_emails: bool
+) -> Optional[Tuple[Dict[str, Dict[str, Any]], Dict[str, str]]]:
+    """Profiles (and emails) from the caches alone, or None as soon as one id is missing."""
+    profiles_map = {}
+    emails_map = {}
+    with profile_cache_lock:
+        for user_id in user_ids:
+            profile = profile_cache.get(user_id)
+            if profile is None:
+                return None
+            profiles_map[user_id] = profile
+    if with_emails:
+        with auth_user_cache_lock:
+            for user_id in user_ids:
+                auth_user = auth_user_cache.get(user_id)
+                if auth_user is None:
+                    return None
+                emails_map[user_id] = auth_user["email"]
+    return profiles_map, emails_map
+
+
+async def _guarded_fetch(func, *args) -> Optional[Any]:
+    """
+    Run a blocking lookup in a worker thread behind the profile circuit breaker.
+    
+    Returns None while the breaker is open or if the lookup fails with a
+    Supabase error; other exceptions propagate. Breaker state is only touched
+    on the event loop, so it needs no lock.
+    """
+    global _breaker_failures, _breaker_open_until
+    
+    if monotonic() < _breaker_open_until:
+        return None
+    
+    try:
+        result = await asyncio.to_thread(func, *args)
+    except _SUPABASE_ERRORS as e:
+        profile_fetch_errors.inc()
+        _breaker_failures += 1
+        logger.warning(f"User data lookup failed ({func.__name__}): {type(e).__name__}: {e}")
+        if _breaker_failures >= _BREAKER_FAIL_MAX:
+            _breaker_failures = 0
+            _breaker_open_until = monotonic() + _BREAKER_RESET_SECONDS
+            profile_breaker_opens.inc()
+            logger.error(f"User data lookups failing, skipping them for {_BREAKER_RESET_SECONDS}s")
+        return None
+    
+    _breaker_failures = 0
+    return result
+
+
+async def _fetch_user_data(
+    user_ids: List[str],
     db_client,
     current_user: Dict[str, Any]
+) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, str]]:
+    """Profiles for user_ids, plus auth emails for admin/principal callers (one query either way)."""
+    with_emails = current_user.get("role") in _PRIVILEGED_ROLES
+    
+    # A fully cached page is answered on the event loop, without a thread hop
+    if with_emails or is_service_client(db_client):
+        cached = _cached_user_data(user_ids, with_emails)
+        if cached is not None:
+            return cached
+    
+    if with_emails:
+        return await _guarded_fetch(_fetch_profiles_with_emails, user_ids) or ({}, {})
+    return await _guarded_fetch(_fetch_profiles, user_ids, db_client) or {}, {}
+
+
+async def _fetch_emails_if_allowed(user_ids: List[str], current_user: Dict[str, Any]) -> Dict[str, str]:
+    """Auth emails for admin/principal callers (empty for others or if unavailable)."""
+    if current_user.get("role") not in _PRIVILEGED_ROLES:
+        return {}
+    return await _guarded_fetch(_fetch_auth_emails, user_ids) or {}
+
+
+async def _populate_user_data(
+    records: List[Dict[str, Any]],
+    db_client,
+    current_user: Dict[str, Any],
+    role: str,
+    profiles: Optional[List[Dict[str, Any]]] = None
 ) -> List[Dict[str, Any]]:
-    """Populate student records with user data from profiles table"""
-    if not students:
-        return students
+    """Attach a "user" object (profile + email) to each record with a user_id."""
+    if not records:
+        return records
     
     # Get all user_ids
-    user_ids = [s.get("user_id") for s in students if s.get("user_id")]
+    user_ids = [r.get("user_id") for r in records if r.get("user_id")]
     if not user_ids:
-        return students
+        return records
     
-    # Fetch all profiles in one query
-    try:
-        profiles_response = db_client.table("profiles").select("user_id, full_name, phone, address, avatar_url, created_at").in_("user_id", user_ids).execute()
-        profiles_map = {
-            p.get("user_id"): p 
-            for p in profiles_response.data
-        }
-        
-        # Get auth user emails (if admin/principal)
-        emails_map = {}
-        if current_user.get("role") in ["admin", "principal"]:
-            try:
-                from app.core.supabase import supabase_admin
-                for user_id in user_ids:
-                    try:
-                        auth_user = supabase_admin.auth.admin.get_user_by_id(user_id)
-                        if auth_user and auth_user.user:
-                            emails_map[user_id] = auth_user.user.email
-                    except Exception:
-                        pass  # Skip if can't get email
-            except Exception:
-                pass  # Skip email fetching if not available
-        
-        # Attach user data to each student
-        for student in students:
-            user_id = student.get("user_id")
-            if user_id and user_id in profiles_map:
-                profile = profiles_map[user_id]
-                student["user"] = {
-                    "id": user_id,
-                    "email": emails_map.get(user_id, ""),
-                    "full_name": profile.get("full_name", ""),
-                    "role": "student",
-                    "phone": profile.get("phone"),
-                    "address": profile.get("address"),
-                    "avatar_url": profile.get("avatar_url"),
-                    "created_at": profile.get("created_at")
-                }
-    except Exception:
-        # If profile fetch fails, continue without user data
-        pass
-    
-    return students
-
-
-def populate_teacher_user_data(
-    teachers: List[Dict[str, Any]], 
+    # Fetch all profiles (and emails, for admins) in one query, unless supplied;
+    # if the lookup fails, records are returned without user data
+    if profiles is None:
+        profiles_map, emails_map = await _fetch_user_data(user_ids, db_client, current_user)
+    else:
+        profiles_map = {p.get("user_id"): p for p in profiles}
+        emails_map = await _fetch_emails_if_allowed(user_ids, current_user)
+    
+    # Attach user data to each record
+    for record in records:
+        user_id = record.get("user_id")
+        if user_id and user_id in profiles_map:
+            profile = profiles_map[user_id]
+            record["user"] = {
+                "id": user_id,
+                "email": emails_map.get(user_id, ""),
+                "full_name": profile.get("full_name", ""),
+                "role": role,
+                "phone": profile.get("phone"),
+                "address": profile.get("address"),
+                "avatar_url": profile.get("avatar_url"),
+                "created_at": profile.get("created_at")
+            }
+    
+    return records
+
+
+async def populate_student_user_data(
+    students: List[Dict[str, Any]], 
     db_client,
     current_user: Dict[str, Any]
 ) -> List[Dict[str, Any]]:
-    """Populate teacher records with user data from profiles table"""
-    if not teachers:
-        return teachers
-    
-    # Get all user_ids
-    user_ids = [t.get("user_id") for t in teachers if t.get("user_id")]
-    if not user_ids:
-        return teachers
+    """Populate student records with user data from profiles table"""
+    return await _populate_user_data(students, db_client, current_user, "student")
+
+
+async def populate_teacher_user_data(
+    teachers: List[Dict[str, Any]], 
+    db_client,
+    current_user: Dict[str, Any],
+    profiles: Optional[List[Dict[str, Any]]] = None
+) -> List[Dict[str, Any]]:
+    """Populate teacher records with user data from profiles table.
     
-    # Fetch all profiles in one query
-    try:
-        profiles_response = db_client.table("profiles").select("user_id, full_name, phone, address, avatar_url, created_at").in_("user_id", user_ids).execute()
-        profiles_map = {
-            p.get("user_id"): p 
-            for p in profiles_response.data
-        }
-        
-        # Get auth user emails (if admin/principal)
-        emails_map = {}
-        if current_user.get("role") in ["admin", "principal"]:
-            try:
-                from app.core.supabase import supabase_admin
-                for user_id in user_ids:
-                    try:
-                        auth_user = supabase_admin.auth.admin.get_user_by_id(user_id)
-                        if auth_user and auth_user.user:
-                            emails_map[user_id] = auth_user.user.email
-                    except Exception:
-                        pass  # Skip if can't get email
-            except Exception:
-                pass  # Skip email fetching if not available
-        
-        # Attach user data to each teacher
-        for teacher in teachers:
-            user_id = teacher.get("user_id")
-            if user_id and user_id in profiles_map:
-                profile = profiles_map[user_id]
-                teacher["user"] = {
-                    "id": user_id,
-                    "email": emails_map.get(user_id, ""),
-                    "full_name": profile.get("full_name", ""),
-                    "role": "teacher",
-                    "phone": profile.get("phone"),
-                    "address": profile.get("address"),
-                    "avatar_url": profile.get("avatar_url"),
-                    "created_at": profile.get("created_at")
-                }
-    except Exception:
-        # If profile fetch fails, continue without user data
-        pass
-    
-    return teachers
+    Callers that already hold the profile rows (e.g. from an update's returned
+    representation) can pass them as `profiles` to skip the profiles query.
+    """
+    return await _populate_user_data(teachers, db_client, current_user, "teacher", profiles)
+
 
+def validated_json_response(adapter: TypeAdapter, rows: Any) -> Response:
+    """Validate rows against a module-level TypeAdapter and serialize them in one pass.
+    
+    Both steps run in pydantic-core, avoiding a Python-level model instantiation per row.
+    """
+    return Response(
+        content=adapter.dump_json(adapter.validate_python(rows)),
+        media_type="application/json"
+    )
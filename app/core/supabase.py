@@ -1,11 +1,57 @@
-from supabase import create_client, Client
+from hashlib import blake2b
+from threading import Lock
+import httpx
+from cachetools import TTLCache
+from supabase import create_client, Client, ClientOptions
 from app.core.config import settings
+from app.core.metrics import instrument_client
 from typing import Optional
 
 # Global client instances (lazy initialization)
 _supabase_client: Optional[Client] = None
 _supabase_admin_client: Optional[Client] = None
 
+# Per-user clients, reused while the token is valid so repeated requests keep
+# their keep-alive connections. Keyed by a token hash, never the raw token.
+_SCOPED_CLIENT_TTL_SECONDS = 300
+_scoped_clients: TTLCache = TTLCache(maxsize=1024, ttl=_SCOPED_CLIENT_TTL_SECONDS)
+_scoped_clients_lock = Lock()
+
+# Keep-alive connection pool shared by every client, for both PostgREST and
+# GoTrue (auth admin calls such as get_user_by_id / delete_user); both live on
+# the Supabase host. HTTP/2 needs the h2 package (httpx[http2] in requirements)
+_transport = httpx.HTTPTransport(
+    http2=True,
+    limits=httpx.Limits(max_connections=200, max_keepalive_connections=100, keepalive_expiry=60)
+)
+
+
+# Fail Supabase calls after 30s (PostgREST default: 120s) so a stalled
+# query doesn't hold a pooled connection for minutes
+_HTTP_TIMEOUT_SECONDS = 30
+
+
+def _create_pooled_client(key: str) -> Client:
+    """
+    Create an instrumented client using the shared connection pool.
+    
+    Each client gets its own httpx.Client (postgrest sets its base URL and
+    auth headers on it), backed by the shared transport.
+    """
+    http_client = httpx.Client(transport=_transport, timeout=_HTTP_TIMEOUT_SECONDS)
+    options = ClientOptions(httpx_client=http_client)
+    return instrument_client(create_client(settings.SUPABASE_URL, key, options=options))
+
+
+def warm_connection_pool() -> None:
+    """Open a Supabase connection at startup so the first requests skip the TCP/TLS handshake."""
+    _ensure_supabase_admin().postgrest.session.head("/")
+
+
+def close_connection_pool() -> None:
+    """Close the shared connection pool (application shutdown)."""
+    _transport.close()
+
 
 def get_supabase_client() -> Client:
     """Get Supabase client instance"""
@@ -13,7 +59,7 @@ def get_supabase_client() -> Client:
         raise RuntimeError(
             "Settings not initialized. Ensure environment variables are set before using Supabase clients."
         )
-    return create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY)
+    return _create_pooled_client(settings.SUPABASE_KEY)
 
 
 def get_supabase_admin_client() -> Client:
@@ -22,7 +68,7 @@ def get_supabase_admin_client() -> Client:
         raise RuntimeError(
             "Settings not initialized. Ensure environment variables are set before using Supabase clients."
         )
-    return create_client(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_KEY)
+    return _create_pooled_client(settings.SUPABASE_SERVICE_KEY)
 
 
 def _ensure_supabase() -> Client:
@@ -33,6 +79,11 @@ def _ensure_supabase() -> Client:
     return _supabase_client
 
 
+def is_service_client(client) -> bool:
+    """Whether client is the shared service-role client (reads bypass RLS)."""
+    return client is not None and client is _supabase_admin_client
+
+
 def _ensure_supabase_admin() -> Client:
     """Lazy initialization helper for supabase admin client"""
     global _supabase_admin_client
@@ -86,19 +137,27 @@ def get_request_scoped_client(access_token: str | None, is_admin: bool, supabase
         raise RuntimeError(
             "Settings not initialized. Ensure environment variables are set before using Supabase clients."
         )
-    client = create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY)
     
     # If we have a Supabase session token, use it for RLS
     # Supabase RLS requires Supabase's own JWT format
-    if supabase_token:
-        # Set Supabase JWT token in PostgREST headers for RLS
+    # Fallback: custom JWT (for backend auth, but RLS may not work fully)
+    # This is used when Supabase token is not available (e.g., old tokens)
+    token = supabase_token or access_token
+    cache_key = blake2b((token or "").encode(), digest_size=16).digest()
+    
+    with _scoped_clients_lock:
+        client = _scoped_clients.get(cache_key)
+    if client is not None:
+        return client
+    
+    client = _create_pooled_client(settings.SUPABASE_KEY)
+    if token:
+        # Set the JWT in PostgREST headers for RLS
         # This is the correct way to enable RLS with Supabase Python client
-        client.postgrest.headers.update({"Authorization": f"Bearer {supabase_token}"})
-    elif access_token:
-        # Fallback: set custom JWT in headers (for backend auth, but RLS may not work fully)
-        # This is used when Supabase token is not available (e.g., old tokens)
-        client.postgrest.headers.update({"Authorization": f"Bearer {access_token}"})
+        client.postgrest.headers.update({"Authorization": f"Bearer {token}"})
     
+    with _scoped_clients_lock:
+        _scoped_clients[cache_key] = client
     return client
 
 
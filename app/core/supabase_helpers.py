@@ -1,8 +1,19 @@
 """Helper functions for Supabase client management"""
 
+import httpx
+from fastapi import Depends
+from postgrest.exceptions import APIError
+from supabase_auth.errors import AuthApiError
 from app.core.supabase import get_request_scoped_client, Client
+from app.core.security import get_current_user
 from typing import Dict, Any, Optional
 
+# Roles that use the service role client (bypass RLS)
+_PRIVILEGED_ROLES = frozenset({"admin", "principal"})
+
+# Errors raised by the Supabase clients themselves (PostgREST, GoTrue, transport)
+_SUPABASE_ERRORS = (APIError, AuthApiError, httpx.HTTPError)
+
 
 def get_db_client(current_user: Dict[str, Any], is_admin_operation: bool = False) -> Client:
     """Helper function to get properly scoped Supabase client from current_user.
@@ -19,7 +30,19 @@ def get_db_client(current_user: Dict[str, Any], is_admin_operation: bool = False
     """
     access_token = current_user.get("access_token")
     supabase_token = current_user.get("supabase_token")
-    is_admin = current_user.get("role") in ["admin", "principal"] or is_admin_operation
+    is_admin = current_user.get("role") in _PRIVILEGED_ROLES or is_admin_operation
     
     return get_request_scoped_client(access_token, is_admin, supabase_token)
 
+
+async def scoped_db(current_user: Dict[str, Any] = Depends(get_current_user)) -> Client:
+    """FastAPI dependency returning the Supabase client scoped to the caller's role.
+    
+    Declared as a dependency so FastAPI resolves it (and get_current_user) once per request.
+    """
+    return get_request_scoped_client(
+        current_user.get("access_token"),
+        current_user.get("role") in _PRIVILEGED_ROLES,
+        current_user.get("supabase_token")
+    )
+
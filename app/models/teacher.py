@@ -1,5 +1,5 @@
-from pydantic import BaseModel, ConfigDict, field_validator
-from typing import Optional, List, Union
+from pydantic import BaseModel, ConfigDict, field_serializer, field_validator
+from typing import Optional, List
 from datetime import date, datetime
 from app.models.user import UserResponse
 
@@ -29,7 +29,7 @@ class TeacherCreate(BaseModel):
     
     # Teacher specific
     employee_id: str
-    join_date: Union[date, str]  # Accept both date object and ISO string
+    join_date: date  # Accepts a date object or ISO string (see parse_join_date)
     qualification: str
     
     @field_validator('join_date', mode='before')
@@ -47,6 +47,12 @@ class TeacherCreate(BaseModel):
                 except ValueError:
                     raise ValueError(f"Invalid date format: {v}. Expected YYYY-MM-DD")
         return v
+    
+    @field_serializer('join_date')
+    def serialize_join_date(self, v: date) -> str:
+        """Store join_date as an ISO date string"""
+        return v.isoformat()
+    
     subjects: List[str]
     salary_info: SalaryInfo
     cnic_number: Optional[str] = None
@@ -94,6 +100,6 @@ class TeacherResponse(BaseModel):
     remarks: Optional[str] = None
     user: Optional[UserResponse] = None
     
-    model_config = ConfigDict(from_attributes=True)
+    model_config = ConfigDict(extra="ignore", from_attributes=False)
 
 
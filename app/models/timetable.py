@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from typing import Optional, List
 from datetime import datetime, time
 
@@ -36,8 +36,7 @@ class TimetableResponse(TimetableBase):
     created_at: datetime
     updated_at: datetime
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(extra="ignore", from_attributes=False)
 
 
 class TimetableEntryBase(BaseModel):
@@ -73,8 +72,7 @@ class TimetableEntryResponse(TimetableEntryBase):
     """Schema for timetable entry response"""
     id: str
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(extra="ignore", from_attributes=False)
 
 
 class TimetableWithEntries(TimetableResponse):
@@ -1,7 +1,9 @@
 from fastapi import FastAPI, Request, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse
 from contextlib import asynccontextmanager
+import asyncio
+import secrets
 from app.core.config import settings, validate_settings
 from app.core.logging_config import setup_logging, get_logger
 from app.core.exceptions import (
@@ -14,8 +16,12 @@ from app.core.exceptions import (
     sanitize_error_message
 )
 from app.core.rate_limit import RateLimitMiddleware
+from app.core.metrics import LATENCY_BUCKETS
+from app.core.supabase import warm_connection_pool, close_connection_pool
+from starlette_exporter import PrometheusMiddleware, handle_metrics
 from app.core.security_middleware import SecurityHeadersMiddleware
-from app.api.v1.router import api_router
+from app.core.lazy_routes import LazyRouterMiddleware
+from app.api.v1.router import api_router, lazy_routes
 
 # Setup logging first (before settings validation)
 setup_logging()
@@ -42,10 +48,17 @@ async def lifespan(app: FastAPI):
         logger.exception("❌ Unexpected error during startup")
         raise
     
+    # Pre-open the Supabase connection pool (non-fatal if Supabase is unreachable)
+    try:
+        await asyncio.to_thread(warm_connection_pool)
+    except Exception as e:
+        logger.warning(f"Could not warm Supabase connection pool: {e}")
+    
     yield
     
     # Shutdown
     logger.info("Shutting down application")
+    close_connection_pool()
 
 
 # Initialize FastAPI app
@@ -55,6 +68,7 @@ app = FastAPI(
     version=settings.APP_VERSION,
     description="Comprehensive School Management System API",
     lifespan=lifespan,
+    default_response_class=ORJSONResponse,
     docs_url="/api/docs" if settings.DEBUG else None,
     redoc_url="/api/redoc" if settings.DEBUG else None,
     openapi_url="/api/openapi.json" if settings.DEBUG else None,
@@ -123,17 +137,45 @@ async def general_exception_handler(request: Request, exc: Exception):
     )
 
 
+# Request latency/count metrics, exposed at /metrics
+app.add_middleware(
+    PrometheusMiddleware,
+    app_name="ghani",
+    prefix="http",
+    buckets=LATENCY_BUCKETS,
+)
+
+
+async def metrics(request: Request):
+    """Prometheus metrics, for scrapers sending the METRICS_TOKEN bearer token."""
+    authorization = request.headers.get("authorization", "")
+    if not secrets.compare_digest(authorization.encode(), f"Bearer {settings.METRICS_TOKEN}".encode()):
+        return JSONResponse(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            content={"error": True, "message": "Unauthorized", "error_code": "UNAUTHORIZED", "details": None},
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return handle_metrics(request)
+
+
+# Metrics reveal routes and database latencies, so they are only served with a token
+if settings.METRICS_TOKEN:
+    app.add_route("/metrics", metrics)
+else:
+    logger.info("METRICS_TOKEN not set; /metrics is disabled")
+
 # Security headers middleware (add first to ensure headers are set)
 app.add_middleware(SecurityHeadersMiddleware)
 
 # Rate limiting middleware (before CORS)
-# In production, consider using Redis-based rate limiting for multiple workers
+# Limits are kept per worker process: with N gunicorn workers a client can get
+# up to N times these, so lower them (RATE_LIMIT_* env vars) accordingly
 if not settings.DEBUG:
     app.add_middleware(
         RateLimitMiddleware,
-        requests_per_minute=60,
-        requests_per_hour=1000,
-        burst_size=10
+        requests_per_minute=settings.RATE_LIMIT_PER_MINUTE,
+        requests_per_hour=settings.RATE_LIMIT_PER_HOUR,
+        burst_size=settings.RATE_LIMIT_BURST
     )
 
 # CORS Configuration
@@ -165,13 +207,25 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE", "PATCH", "OPTIONS"],
     allow_headers=["*"],
-    expose_headers=["X-RateLimit-Limit-PerMinute", "X-RateLimit-Limit-PerHour"],
+    expose_headers=[
+        "X-RateLimit-Limit-PerMinute", "X-RateLimit-Limit-PerHour",
+        "X-RateLimit-Remaining-PerMinute", "X-RateLimit-Remaining-PerHour",
+        "X-Next-Cursor",
+    ],
     max_age=3600,  # Cache preflight requests for 1 hour
 )
 
 # Include API router
 app.include_router(api_router, prefix="/api/v1")
 
+# Rarely used endpoint modules are imported on their first request
+if lazy_routes:
+    app.add_middleware(
+        LazyRouterMiddleware,
+        fastapi_app=app,
+        lazy_routes={f"/api/v1{prefix}": route for prefix, route in lazy_routes.items()}
+    )
+
 
 @app.get("/")
 async def root():
@@ -0,0 +1,313 @@
+-- =====================================================
+-- PERFORMANCE INDEXES & FUNCTIONS - Ghani Grammar School
+-- =====================================================
+-- Execute this in Supabase SQL Editor after the main schemas
+-- (database_schema.sql, exam_management_schema.sql, ...)
+-- Every statement is idempotent and safe to re-run
+-- =====================================================
+
+-- Trigram support for ILIKE '%term%' searches
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- ============================================
+-- STUDENTS
+-- ============================================
+-- list_students: ilike("admission_number", "%search%")
+CREATE INDEX IF NOT EXISTS idx_students_admission_number_trgm
+    ON public.students USING gin (admission_number gin_trgm_ops);
+
+-- ============================================
+-- SYLLABUSES
+-- ============================================
+-- get_syllabuses: eq filters on class_id/subject/term, ordered by year DESC
+CREATE INDEX IF NOT EXISTS idx_syllabuses_filter
+    ON public.syllabuses(class_id, subject, term, year DESC);
+-- get_syllabus_stats: recent uploads
+CREATE INDEX IF NOT EXISTS idx_syllabuses_upload_date
+    ON public.syllabuses(upload_date DESC);
+
+-- ============================================
+-- PROFILES
+-- ============================================
+-- list_users: ilike("full_name", "%search%") on user_profiles_with_role
+CREATE INDEX IF NOT EXISTS idx_profiles_full_name_trgm
+    ON public.profiles USING gin (full_name gin_trgm_ops);
+
+-- ============================================
+-- TEACHERS
+-- ============================================
+-- list_teachers: ilike("employee_id", "%search%")
+CREATE INDEX IF NOT EXISTS idx_teachers_employee_id_trgm
+    ON public.teachers USING gin (employee_id gin_trgm_ops);
+-- list_teachers?status=active: the common dashboard listing
+CREATE INDEX IF NOT EXISTS idx_teachers_active
+    ON public.teachers(created_at DESC, id DESC) WHERE status = 'active';
+
+-- ============================================
+-- TIMETABLES
+-- ============================================
+-- get_timetables: keyset pagination on (created_at, id)
+CREATE INDEX IF NOT EXISTS idx_timetables_created_at_id
+    ON public.timetables(created_at DESC, id DESC);
+-- get_timetables?teacher_id= / get_teacher_timetables: the
+-- timetable_entries!inner join becomes an index-only scan
+CREATE INDEX IF NOT EXISTS idx_timetable_entries_teacher
+    ON public.timetable_entries(teacher_id) INCLUDE (timetable_id);
+-- delete_timetable relies on entries being removed with their timetable
+ALTER TABLE public.timetable_entries
+    DROP CONSTRAINT IF EXISTS timetable_entries_timetable_id_fkey,
+    ADD CONSTRAINT timetable_entries_timetable_id_fkey
+        FOREIGN KEY (timetable_id) REFERENCES public.timetables(id) ON DELETE CASCADE;
+
+-- ============================================
+-- INVOICES
+-- ============================================
+-- generate_invoice_number seeds a month's counter with a count over this range
+CREATE INDEX IF NOT EXISTS idx_invoices_invoice_date
+    ON public.invoices(invoice_date);
+
+-- Verify index usage with, for example:
+-- EXPLAIN ANALYZE SELECT * FROM public.students WHERE admission_number ILIKE '%123%';
+-- EXPLAIN ANALYZE SELECT * FROM public.teachers WHERE employee_id ILIKE '%T-10%';
+-- EXPLAIN ANALYZE SELECT * FROM public.profiles WHERE full_name ILIKE '%ahmad%';
+-- EXPLAIN ANALYZE SELECT * FROM public.syllabuses
+--     WHERE class_id = '<uuid>' AND subject = 'Math' ORDER BY year DESC, term;
+
+-- ============================================
+-- FUNCTIONS (called via PostgREST RPC)
+-- ============================================
+
+-- create_student: insert profile + student in one transaction / round trip.
+-- The auth user is created beforehand through the admin API.
+CREATE OR REPLACE FUNCTION public.create_student(
+    p_user_id UUID,
+    p_full_name TEXT,
+    p_phone TEXT,
+    p_address TEXT,
+    p_admission_number TEXT,
+    p_admission_date DATE,
+    p_class_id UUID,
+    p_guardian JSONB
+)
+RETURNS public.students
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    result public.students;
+BEGIN
+    INSERT INTO public.profiles (user_id, full_name, phone, address)
+    VALUES (p_user_id, p_full_name, p_phone, p_address);
+
+    INSERT INTO public.students (user_id, admission_number, admission_date, class_id, guardian_info, status)
+    VALUES (p_user_id, p_admission_number, p_admission_date, p_class_id, p_guardian, 'active')
+    RETURNING * INTO result;
+
+    RETURN result;
+END;
+$$;
+
+-- update_teacher_full: apply profile + teacher updates in one transaction / round trip.
+-- Only the keys present in each JSONB object are written; values are cast to the
+-- column types through jsonb_populate_record. Returns both rows so the API can
+-- build its response without re-reading them.
+CREATE OR REPLACE FUNCTION public.update_teacher_full(
+    p_teacher_id UUID,
+    p_profile JSONB,
+    p_teacher JSONB
+)
+RETURNS JSONB
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    set_clause TEXT;
+    teacher_row public.teachers;
+    profile_row public.profiles;
+BEGIN
+    SELECT string_agg(format('%I = r.%I', key, key), ', ')
+    INTO set_clause
+    FROM jsonb_object_keys(COALESCE(p_teacher, '{}'::jsonb)) AS key;
+
+    IF set_clause IS NOT NULL THEN
+        EXECUTE format(
+            'UPDATE public.teachers t SET %s
+             FROM jsonb_populate_record(NULL::public.teachers, $1) r
+             WHERE t.id = $2 RETURNING t.*',
+            set_clause
+        ) INTO teacher_row USING p_teacher, p_teacher_id;
+    ELSE
+        SELECT * INTO teacher_row FROM public.teachers WHERE id = p_teacher_id;
+    END IF;
+
+    IF teacher_row.id IS NULL THEN
+        RETURN NULL;
+    END IF;
+
+    SELECT string_agg(format('%I = r.%I', key, key), ', ')
+    INTO set_clause
+    FROM jsonb_object_keys(COALESCE(p_profile, '{}'::jsonb)) AS key;
+
+    IF set_clause IS NOT NULL THEN
+        EXECUTE format(
+            'UPDATE public.profiles p SET %s
+             FROM jsonb_populate_record(NULL::public.profiles, $1) r
+             WHERE p.user_id = $2 RETURNING p.*',
+            set_clause
+        ) INTO profile_row USING p_profile, teacher_row.user_id;
+    ELSE
+        SELECT * INTO profile_row FROM public.profiles WHERE user_id = teacher_row.user_id;
+    END IF;
+
+    RETURN jsonb_build_object('teacher', to_jsonb(teacher_row), 'profile', to_jsonb(profile_row));
+END;
+$$;
+
+-- get_class_timetable: a class's final timetable if one exists, otherwise its
+-- newest draft, in a single query.
+CREATE OR REPLACE FUNCTION public.get_class_timetable(p_class_id UUID)
+RETURNS SETOF public.timetables
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT *
+    FROM public.timetables
+    WHERE class_id = p_class_id
+    ORDER BY (status = 'final') DESC, created_at DESC
+    LIMIT 1;
+$$;
+
+-- financial_summary: income, expense and paid-salary totals and breakdowns
+-- plus the cost of stationery distributed (quantity x the item's unit price)
+-- for a date range, so financial reports receive a few aggregates instead of
+-- every row. Runs with the caller's permissions (RLS applies as for the table
+-- reads it replaces).
+CREATE OR REPLACE FUNCTION public.financial_summary(p_start DATE, p_end DATE)
+RETURNS JSONB
+LANGUAGE sql
+STABLE
+AS $$
+    WITH income AS (
+        SELECT COALESCE(purpose, 'General') AS purpose, SUM(amount) AS total, COUNT(*) AS n
+        FROM public.donations
+        WHERE date BETWEEN p_start AND p_end
+        GROUP BY 1
+    ), spending AS (
+        SELECT category, SUM(amount) AS total, COUNT(*) AS n
+        FROM public.expenses
+        WHERE date BETWEEN p_start AND p_end
+        GROUP BY 1
+    ), salaries AS (
+        SELECT COALESCE(SUM(net_salary), 0) AS total, COUNT(*) AS n
+        FROM public.salary_records
+        WHERE paid_date BETWEEN p_start AND p_end
+    ), distributions AS (
+        SELECT COALESCE(SUM(d.quantity * COALESCE(i.unit_price, 0)), 0) AS total
+        FROM public.stationery_distributions d
+        LEFT JOIN public.stationery_items i ON i.id = d.item_id
+        WHERE d.distributed_date BETWEEN p_start AND p_end
+    )
+    SELECT jsonb_build_object(
+        'total_income', (SELECT COALESCE(SUM(total), 0) FROM income),
+        'income_breakdown', (SELECT COALESCE(jsonb_object_agg(purpose, total), '{}'::jsonb) FROM income),
+        'donations_count', (SELECT COALESCE(SUM(n), 0) FROM income),
+        'total_expenses', (SELECT COALESCE(SUM(total), 0) FROM spending),
+        'expense_breakdown', (SELECT COALESCE(jsonb_object_agg(category, total), '{}'::jsonb) FROM spending),
+        'expenses_count', (SELECT COALESCE(SUM(n), 0) FROM spending),
+        'total_paid_salaries', (SELECT total FROM salaries),
+        'salary_records_count', (SELECT n FROM salaries),
+        'total_stationery', (SELECT total FROM distributions)
+    );
+$$;
+
+-- first_activity_date: earliest date with any donation, expense, salary
+-- payment, stationery distribution or approved salary calculation (NULL if
+-- there are none). Reports skip the previous-period aggregation when that
+-- period ends before it. Runs with the caller's permissions.
+CREATE OR REPLACE FUNCTION public.first_activity_date()
+RETURNS DATE
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT LEAST(
+        (SELECT MIN(date) FROM public.donations),
+        (SELECT MIN(date) FROM public.expenses),
+        (SELECT MIN(paid_date) FROM public.salary_records),
+        (SELECT MIN(distributed_date) FROM public.stationery_distributions),
+        (SELECT MIN(make_date(calculation_year, calculation_month, 1))
+         FROM public.monthly_salary_calculations
+         WHERE is_approved)
+    );
+$$;
+
+-- ============================================
+-- INVOICE NUMBERING
+-- ============================================
+
+-- invoice_counters: last issued sequence number per (year, month). Only
+-- written by generate_invoice_number, so RLS stays on with no policies.
+CREATE TABLE IF NOT EXISTS public.invoice_counters (
+    year INTEGER NOT NULL,
+    month INTEGER NOT NULL CHECK (month >= 1 AND month <= 12),
+    seq INTEGER NOT NULL,
+    PRIMARY KEY (year, month)
+);
+
+ALTER TABLE public.invoice_counters ENABLE ROW LEVEL SECURITY;
+
+-- generate_invoice_number: next INV-YYYY-MM-XXXXX number for a month. The row
+-- lock taken by the UPDATE / upsert serializes concurrent callers, so numbers
+-- are never handed out twice. A month's first call continues after the
+-- invoices that existed before the counter did.
+CREATE OR REPLACE FUNCTION public.generate_invoice_number(p_year INTEGER, p_month INTEGER)
+RETURNS TEXT
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+    v_seq INTEGER;
+BEGIN
+    UPDATE public.invoice_counters
+    SET seq = seq + 1
+    WHERE year = p_year AND month = p_month
+    RETURNING seq INTO v_seq;
+
+    IF NOT FOUND THEN
+        INSERT INTO public.invoice_counters (year, month, seq)
+        SELECT p_year, p_month, COUNT(*) + 1
+        FROM public.invoices
+        WHERE invoice_date >= make_date(p_year, p_month, 1)
+          AND invoice_date < make_date(p_year, p_month, 1) + INTERVAL '1 month'
+        ON CONFLICT (year, month) DO UPDATE SET seq = public.invoice_counters.seq + 1
+        RETURNING seq INTO v_seq;
+    END IF;
+
+    RETURN format('INV-%s-%s-%s', p_year, lpad(p_month::TEXT, 2, '0'), lpad(v_seq::TEXT, 5, '0'));
+END;
+$$;
+
+-- Runs as its owner (bypassing RLS on invoices), so it is not callable by anon
+REVOKE EXECUTE ON FUNCTION public.generate_invoice_number(INTEGER, INTEGER) FROM PUBLIC, anon;
+GRANT EXECUTE ON FUNCTION public.generate_invoice_number(INTEGER, INTEGER) TO authenticated, service_role;
+
+-- ============================================
+-- VIEWS
+-- ============================================
+
+-- user_profiles_with_role: profiles joined with their auth user so list_users
+-- can filter by role and read emails in one query instead of one GoTrue call
+-- per user. Reads auth.users, so it is restricted to the service role.
+CREATE OR REPLACE VIEW public.user_profiles_with_role AS
+SELECT
+    p.user_id AS id,
+    u.email,
+    p.full_name,
+    COALESCE(u.raw_user_meta_data->>'role', 'student') AS role,
+    p.phone,
+    p.address,
+    p.avatar_url,
+    p.created_at
+FROM public.profiles p
+JOIN auth.users u ON u.id = p.user_id;
+
+REVOKE ALL ON public.user_profiles_with_role FROM anon, authenticated;
+GRANT SELECT ON public.user_profiles_with_role TO service_role;